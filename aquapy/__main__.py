@@ -1,35 +1,14 @@
 from __future__ import annotations
-import argparse, asyncio, sys, os, json, multiprocessing
+import argparse, sys, os
 from pathlib import Path
 from typing import List
 from .config import Settings, PORT_ALIASES
-from .models import Entry, PreflightResult, ShotResult
-from .probe import expand_targets_line, probe_target
-from .screenshot import screenshot_url
-from .report import render_report
-from .utils import extract_targets_from_text
-from .nmap_masscan import parse_open_ports
-from .cluster import cluster_phashes
+from .models import Entry
 
-VERSION = "0.5.0"
+# only argparse and the settings are imported up front: httpx, Playwright, Pillow/imagehash and numpy load
+# with the stage that needs them, so -version and -session start in a fraction of the time a scan does
 
-async def worker(q: asyncio.Queue, settings: Settings, out_dir: str, entries: list[Entry], fingerprints_path: str):
-    shots_dir = os.path.join(out_dir, "screenshots"); os.makedirs(shots_dir, exist_ok=True)
-    while True:
-        item = await q.get()
-        if item is None:
-            q.task_done(); break
-        target = item
-        pre = await probe_target(target, timeout_ms=settings.http_timeout_ms, save_body=settings.save_body, out_dir=out_dir, debug=settings.debug, proxy=settings.proxy, retries_http=settings.retries_http, fingerprints_path=fingerprints_path, follow_redirects=settings.follow_redirects)
-        shot = None
-        if pre.ok:
-            fname = (pre.final_url or target.url).replace("://","_").replace("/","_") + ".png"
-            path = os.path.join(shots_dir, fname)
-            shot = await screenshot_url(pre.final_url or target.url, path, settings.resolution[0], settings.resolution[1], settings.user_agent, timeout_ms=settings.screenshot_timeout_ms, proxy=settings.proxy, chrome_path=settings.chrome_path, full_page=settings.full_page, profile=settings.profile, retries=settings.retries_shot)
-        entries.append(Entry(preflight=pre, shot=shot))
-        if not settings.silent and pre.ok:
-            print(pre.final_url or pre.url)
-        q.task_done()
+VERSION = "0.5.0"
 
 def parse_ports(arg: str) -> List[int]:
     if arg in PORT_ALIASES:
@@ -40,18 +19,69 @@ def parse_ports(arg: str) -> List[int]:
     except Exception:
         raise SystemExit(f"Invalid -ports value: {arg}")
 
+def parse_size(arg: str) -> int:
+    units = {"k": 1024, "m": 1024**2, "g": 1024**3}
+    s = arg.strip().lower().rstrip("b")
+    try:
+        if s and s[-1] in units:
+            return int(float(s[:-1]) * units[s[-1]])
+        return int(s)
+    except Exception:
+        raise SystemExit(f"Invalid size value: {arg}")
+
 def env_default_out() -> str:
     return os.path.expanduser(os.environ.get("AQUATONE_OUT_PATH","."))
 
+def template_dir(args) -> str:
+    return args.template_path or str(Path(__file__).with_name("templates"))
+
+def load_baseline(args):
+    if not args.baseline:
+        return None
+    from .baseline import Baseline
+    return Baseline.load(os.path.expanduser(args.baseline))
+
+def run_session(args):
+    # -session: report (and diff) from a stored session, no network or browser stack
+    from .cluster import assign_clusters
+    from .report import render_diff, render_report
+    from .session import iter_session
+    out_dir = os.path.expanduser(args.out or env_default_out())
+    os.makedirs(out_dir, exist_ok=True)
+    baseline = load_baseline(args)
+    entries = list(iter_session(args.session))
+    assign_clusters(entries, args.phash_threshold)
+    report_path = render_report(entries, out_dir, template_dir(args), mode=args.report_mode, shard_size=args.report_shard_size)
+    print(report_path)
+    if baseline is not None:
+        print(render_diff(baseline.diff(entries), out_dir, template_dir(args)))
+
 async def run(args):
+    from .cluster import assign_clusters
+    from .fingerprints import load_fingerprinter
+    from .pipeline import Pipeline
+    from .report import render_diff, render_report, write_urls
+    from .session import SessionStore
+    from .targets import iter_lines, iter_targets, parse_shard
     ports = parse_ports(args.ports)
-    conc = args.threads if args.threads else (multiprocessing.cpu_count() or 8)
+    conc = args.threads if args.threads else (os.cpu_count() or 8)
     res_w, res_h = (int(x) for x in args.resolution.split(",",1))
     settings = Settings(
         concurrency=conc,
         http_timeout_ms=args.http_timeout,
         screenshot_timeout_ms=args.screenshot_timeout,
         scan_timeout_ms=args.scan_timeout,
+        # nmap/masscan already reported these ports open; through a proxy only the proxy can tell
+        port_scan=args.scan and not args.nmap and not args.proxy,
+        scan_concurrency=args.scan_concurrency,
+        per_host=args.per_host,
+        rate=args.rate,
+        max_body_size=parse_size(args.max_body_size),
+        body_compression=args.body_compression,
+        io_workers=args.io_workers,
+        fsync_batch=args.fsync_batch,
+        dns_ttl=args.dns_ttl,
+        dns_concurrency=args.dns_concurrency,
         ports=ports,
         resolution=(res_w, res_h),
         proxy=args.proxy,
@@ -65,128 +95,149 @@ async def run(args):
         retries_http=args.retries_http,
         retries_shot=args.retries_shot,
         phash_threshold=args.phash_threshold,
-        follow_redirects=args.redirect
+        follow_redirects=args.redirect,
+        max_connections=args.max_connections,
+        max_keepalive=args.max_keepalive,
+        http2=args.http2,
+        browsers=args.browsers,
+        pages_per_browser=args.pages_per_browser,
+        browser_recycle=args.browser_recycle,
+        image_workers=args.image_workers,
+        progress_interval=args.progress,
+        metrics_file=args.metrics_file,
+        screenshot_format=args.screenshot_format,
+        screenshot_quality=max(1, min(100, args.screenshot_quality)),
+        thumb_width=args.thumb_width,
+        dedup=args.dedup,
+        probe_concurrency=args.probe_concurrency or conc,
+        screenshot_concurrency=args.screenshot_concurrency or args.browsers * args.pages_per_browser
     )
     out_dir = os.path.expanduser(args.out or env_default_out())
     os.makedirs(out_dir, exist_ok=True)
 
     fingerprints_path = args.fingerprints or str(Path(__file__).with_name("assets") / "wappalyzer_min.json")
-
-    if args.session:
-        with open(args.session, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-        entries = []
-        for item in raw:
-            pre = item.get("preflight") if "preflight" in item else item
-            shot = item.get("shot")
-            pre_obj = PreflightResult(**pre)
-            shot_obj = ShotResult(**shot) if shot else None
-            entries.append(Entry(preflight=pre_obj, shot=shot_obj))
-        _assign_clusters(entries, settings.phash_threshold)
-        report_path = render_report(entries, out_dir, args.template_path or str(Path(__file__).with_name("templates")))
-        print(report_path)
-        return
-
-    lines: List[str] = []
-    if args.input:
-        with open(args.input, "r", encoding="utf-8") as f:
-            lines = f.read().splitlines()
-    else:
-        data = sys.stdin.read()
-        lines = data.splitlines()
-
-    targets = []
-    if args.nmap:
-        if args.input and os.path.exists(args.input):
-            sources = [args.input]
+    # loaded before the store is opened: the baseline may be the session this run overwrites
+    baseline = load_baseline(args)
+    if baseline is not None:
+        baseline.detach(out_dir)
+
+    store = SessionStore(out_dir, fsync_every=settings.fsync_batch)
+    seen = store.seen() if args.resume else None
+    if seen is not None and not settings.silent:
+        print(f"resume: skipping {len(seen)} targets already in {store.path}", file=sys.stderr)
+    if baseline is not None and not settings.silent:
+        print(f"baseline: {len(baseline)} entries from {baseline.path}", file=sys.stderr)
+    shard = parse_shard(args.shard) if args.shard else None
+    targets = iter_targets(iter_lines(args.input), ports, nmap=args.nmap, input_path=args.input, seen=seen, shard=shard, shard_by=args.shard_by)
+    def on_entry(e: Entry):
+        store.append(e)
+        if not settings.silent and e.preflight.ok:
+            print(e.preflight.final_url or e.preflight.url)
+    pipeline = None
+    with store.open(resume=args.resume):
+        if args.workers > 1:
+            from .multiproc import run_workers
+            stats = run_workers(args.workers, settings, out_dir, fingerprints_path, targets, on_entry, baseline=baseline)
         else:
-            text = "\n".join(lines).strip()
-            if text.startswith("<?xml") or "<nmaprun" in text or "<masscan" in text:
-                sources = [text]
-            else:
-                sources = [ln.strip() for ln in lines if ln.strip()]
-        for src in sources:
-            mapping = parse_open_ports(src)
-            for host, open_ports in mapping.items():
-                for p in open_ports:
-                    targets.extend(expand_targets_line(host, [p]))
-    else:
-        extracted = []
-        for line in lines:
-            extracted.extend(extract_targets_from_text(line))
-        if not extracted:
-            extracted = [l for l in lines if l.strip()]
-        for item in extracted:
-            targets.extend(expand_targets_line(item, ports))
-
-    q: asyncio.Queue = asyncio.Queue()
-    for t in targets:
-        await q.put(t)
-    for _ in range(settings.concurrency):
-        await q.put(None)
-    entries: list[Entry] = []
-    tasks = [asyncio.create_task(worker(q, settings, out_dir, entries, fingerprints_path)) for _ in range(settings.concurrency)]
-    await q.join()
-    for t in tasks: await t
-
-    _assign_clusters(entries, settings.phash_threshold)
-
-    urls_path = os.path.join(out_dir, "aquatone_urls.txt")
-    with open(urls_path, "w", encoding="utf-8") as uf:
-        for e in entries:
-            if e.preflight.ok:
-                uf.write(f"{e.preflight.final_url or e.preflight.url}\n")
-
-    report_path = render_report(entries, out_dir, args.template_path or str(Path(__file__).with_name("templates")))
+            async with Pipeline(settings, out_dir, fingerprinter=load_fingerprinter(fingerprints_path), baseline=baseline) as pipeline:
+                await pipeline.run(targets, on_entry)
+            stats = pipeline.stats
+    if not settings.silent:
+        for st in stats.values():
+            if st.done: print(st.summary(), file=sys.stderr)
+        if pipeline and pipeline.scheduler and pipeline.scheduler.backoffs:
+            print(f"scheduler: {pipeline.scheduler.backoffs} host backoffs, {pipeline.scheduler.requeued} throttled probes requeued", file=sys.stderr)
+
+    # the report covers the whole store, including entries from resumed runs
+    entries = list(store)
+    assign_clusters(entries, settings.phash_threshold)
+    aliases = sum(1 for e in entries if e.shot and e.shot.alias_of)
+    if aliases and not settings.silent:
+        print(f"dedup: {aliases} endpoints share another endpoint's screenshot", file=sys.stderr)
+
+    write_urls(entries, out_dir)
+    report_path = render_report(entries, out_dir, template_dir(args), mode=args.report_mode, shard_size=args.report_shard_size)
     if not settings.silent:
         print(report_path)
-    session_path = os.path.join(out_dir, "aquatone_session.json")
-    with open(session_path, "w", encoding="utf-8") as sf:
-        json.dump([e.__dict__ for e in entries], sf, default=lambda o: o.__dict__, indent=2)
-
-def _assign_clusters(entries: List[Entry], threshold: int):
-    items = []
-    for idx, e in enumerate(entries):
-        ph = e.shot.phash if (e.shot and e.shot.phash) else None
-        if ph:
-            items.append((idx, ph))
-    mapping = cluster_phashes(items, threshold=threshold) if items else {}
-    for idx, cid in mapping.items():
-        if entries[idx].shot:
-            entries[idx].shot.cluster_id = cid
+    if baseline is not None:
+        diff = baseline.diff(entries)
+        diff_path = render_diff(diff, out_dir, template_dir(args))
+        if not settings.silent:
+            revalidated = sum(1 for e in entries if e.preflight.revalidated)
+            reused = sum(1 for e in entries if e.shot and e.shot.reused)
+            print(f"baseline: {revalidated} not modified (304), {reused} screenshots reused; {len(diff['new'])} new, {len(diff['changed'])} changed, {len(diff['gone'])} gone", file=sys.stderr)
+            print(diff_path)
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "merge":
+        from .merge import main as merge_main
+        return merge_main(sys.argv[2:])
     ap = argparse.ArgumentParser(prog="aquapy", description="Aquatone-style site flyovers (Chromium)")
     ap.add_argument("-version", action="store_true", help="Print current version")
     ap.add_argument("-chrome-path", dest="chrome_path", help="Full path to Chrome/Chromium executable")
     ap.add_argument("-debug", action="store_true", help="Print debugging information")
     ap.add_argument("-http-timeout", type=int, default=3000, help="Timeout ms for HTTP requests (default 3000)")
-    ap.add_argument("-nmap", action="store_true", help="Parse input as Nmap/Masscan XML")
+    ap.add_argument("-nmap", action="store_true", help="Parse input as port-scanner output, streamed: Nmap/Masscan XML, masscan JSON (-oJ/-oD) or masscan list (-oL)")
     ap.add_argument("-out", default=None, help='Directory to write files to (default "." or AQUATONE_OUT_PATH)')
     ap.add_argument("-ports", default="medium", help='Ports to scan: list "80,443,..." or alias small|medium|large|xlarge (default "medium")')
     ap.add_argument("-proxy", default=None, help="Proxy to use for HTTP requests (e.g. http://127.0.0.1:8080)")
     ap.add_argument("-resolution", default="1440,900", help='Screenshot resolution (default "1440,900")')
     ap.add_argument("-save-body", dest="save_body", action=argparse.BooleanOptionalAction, default=True, help="Save response bodies (default true)")
-    ap.add_argument("-scan-timeout", type=int, default=100, help="Timeout ms for port scans (placeholder, default 100)")
+    ap.add_argument("-max-body-size", dest="max_body_size", default="5M", help='Max response body bytes read/saved per target, e.g. 512k, 5M, 0 = unlimited (default "5M")')
+    ap.add_argument("-body-compression", dest="body_compression", choices=["none","gzip","zstd"], default="none", help="Compress saved bodies (zstd requires zstandard)")
+    ap.add_argument("-io-workers", dest="io_workers", type=int, default=4, help="Threads writing headers/bodies to disk (default 4)")
+    ap.add_argument("-fsync-batch", dest="fsync_batch", type=int, default=256, help="fsync saved artifacts every N files, 0 = never (default 256)")
+    ap.add_argument("-scan-timeout", type=int, default=100, help="Timeout ms for TCP connect port scans (default 100)")
+    ap.add_argument("-no-scan", dest="scan", action="store_false", help="Skip the TCP connect pre-scan (always skipped with -nmap or -proxy)")
+    ap.add_argument("-scan-concurrency", dest="scan_concurrency", type=int, default=512, help="Max concurrent TCP connect attempts (default 512)")
     ap.add_argument("-screenshot-timeout", type=int, default=30000, help="Timeout ms for screenshots (default 30000)")
-    ap.add_argument("-session", help="Load aquatone session JSON and generate HTML report")
+    ap.add_argument("-screenshot-format", dest="screenshot_format", choices=["png","jpeg","webp"], default="png", help="Image format for saved screenshots (default png)")
+    ap.add_argument("-screenshot-quality", dest="screenshot_quality", type=int, default=80, help="JPEG/WebP quality for screenshots and thumbnails, 1-100 (default 80)")
+    ap.add_argument("-thumb-width", dest="thumb_width", type=int, default=480, help="Width in px of the report grid thumbnails, 0 = no thumbnails (default 480)")
+    ap.add_argument("-no-dedup", dest="dedup", action="store_false", help="Screenshot every endpoint, even when several share a final URL and body (by default those are rendered once and linked)")
+    ap.add_argument("-session", help="Load an aquatone session (.jsonl store or legacy .json) and generate HTML report")
+    ap.add_argument("-shard", default=None, help="Only handle shard i of N (i/N, 0 <= i < N) of the expanded targets; combine outputs with 'aquapy merge'")
+    ap.add_argument("-shard-by", dest="shard_by", choices=["host","url"], default="host", help="Shard key: host keeps all ports of a host on one shard (default host)")
+    ap.add_argument("-baseline", default=None, help="Previous session (output dir or .jsonl) for an incremental rescan: conditional requests, unchanged pages keep their old screenshot, and aquapy_diff.html/.json list new, changed and gone endpoints")
+    ap.add_argument("-resume", action="store_true", help="Append to the session store in -out and skip targets already recorded there")
     ap.add_argument("-silent", action="store_true", help="Suppress all output except errors")
+    ap.add_argument("-progress", type=float, default=10, help="Seconds between progress lines on stderr (rates, queue depths, errors by kind, phase p50s), 0 = off (default 10)")
+    ap.add_argument("-metrics-file", dest="metrics_file", default=None, help="Write run metrics here while running and at the end: Prometheus text, or JSON if the name ends in .json")
     ap.add_argument("-template-path", help="Path to HTML template to use for report")
+    ap.add_argument("-report-mode", dest="report_mode", choices=["auto","full","sharded"], default="auto", help="full = single HTML file, sharded = small virtual-scrolling shell + JS data shards, auto = sharded from 2000 entries (default auto)")
+    ap.add_argument("-report-shard-size", dest="report_shard_size", type=int, default=500, help="Cards per data shard in sharded reports (default 500)")
     ap.add_argument("-threads", type=int, default=None, help="Number of concurrent threads (default logical CPUs)")
-    ap.add_argument("-i","--input", dest="input", help="File with input lines (if omitted, read STDIN)")
+    ap.add_argument("-workers", type=int, default=1, help="Worker processes, each with its own event loop, HTTP clients and browser pool; -threads, -browsers, etc. apply per worker (default 1)")
+    ap.add_argument("-per-host", dest="per_host", type=int, default=2, help="Max concurrent probes per host, halved while a host times out or answers 429/503; 0 = unlimited (default 2)")
+    ap.add_argument("-rate", type=float, default=0, help="Global cap on HTTP probes per second, 0 = unlimited (default 0)")
+    ap.add_argument("-probe-concurrency", dest="probe_concurrency", type=int, default=None, help="Concurrent HTTP preflight probes (default -threads)")
+    ap.add_argument("-screenshot-concurrency", dest="screenshot_concurrency", type=int, default=None, help="Concurrent screenshots (default -browsers x -pages-per-browser)")
+    ap.add_argument("-i","--input", dest="input", nargs="+", help="Input files or quoted globs (if omitted, read STDIN)")
     # extras
     ap.add_argument("-full-page", action="store_true", help="Take full-page screenshots (default viewport only)")
     ap.add_argument("-profile", choices=["desktop","mobile"], default="desktop", help="Screenshot profile (desktop|mobile)")
     ap.add_argument("-retries-http", type=int, default=2, help="HTTP preflight retry attempts on errors (default 2)")
     ap.add_argument("-retries-shot", type=int, default=1, help="Screenshot retry attempts (default 1)")
     ap.add_argument("-phash-threshold", type=int, default=10, help="Hamming distance for clustering pHash (default 10)")
-    ap.add_argument("-fingerprints", help="Path to Wappalyzer JSON (defaults to built-in minimal database)")
+    ap.add_argument("-fingerprints", help="Path to Wappalyzer JSON or technologies/ directory (defaults to built-in minimal database)")
     ap.add_argument("-redirect", action="store_true", help="Follow HTTP redirects (default: do not follow)")
+    ap.add_argument("-dns-ttl", dest="dns_ttl", type=int, default=300, help="Seconds to cache DNS answers, NXDOMAIN included (default 300)")
+    ap.add_argument("-dns-concurrency", dest="dns_concurrency", type=int, default=64, help="Max concurrent DNS lookups (default 64)")
+    ap.add_argument("-max-connections", dest="max_connections", type=int, default=100, help="Max pooled HTTP connections for preflight probes (default 100)")
+    ap.add_argument("-max-keepalive", dest="max_keepalive", type=int, default=20, help="Max idle keep-alive HTTP connections (default 20)")
+    ap.add_argument("-http2", action="store_true", help="Negotiate HTTP/2 for preflight probes (requires h2)")
+    ap.add_argument("-browsers", type=int, default=2, help="Number of Chromium processes kept alive in the pool (default 2)")
+    ap.add_argument("-pages-per-browser", dest="pages_per_browser", type=int, default=4, help="Concurrent pages per pooled browser (default 4)")
+    ap.add_argument("-browser-recycle", dest="browser_recycle", type=int, default=250, help="Restart a pooled browser after this many pages (default 250)")
+    ap.add_argument("-image-workers", dest="image_workers", type=int, default=2, help="Processes for screenshot hashing/encoding, 0 = thread pool (default 2)")
 
     args = ap.parse_args()
     if args.version:
         print(VERSION)
         return
+    if args.session:
+        return run_session(args)
+    import asyncio
     asyncio.run(run(args))
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+from __future__ import annotations
+import asyncio, gzip, os, shutil, threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+COMPRESSION_SUFFIX = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+class ArtifactSink:
+    # write-behind queue for headers/bodies: the event loop only enqueues, a small thread pool touches the disk
+    def __init__(self, out_dir: str, workers: int = 4, max_pending: int = 256, fsync_batch: int = 256, compression: str = "none"):
+        if compression not in COMPRESSION_SUFFIX:
+            raise SystemExit(f"Invalid body compression: {compression}")
+        self._zstd = None
+        if compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise SystemExit("-body-compression zstd requires the 'zstandard' package")
+            self._zstd = zstandard.ZstdCompressor(level=3)
+        self.out_dir = out_dir
+        self.compression = compression
+        self.fsync_batch = fsync_batch
+        self.written = 0
+        self.errors = 0
+        self._workers = max(1, workers)
+        self._q: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_pending))
+        self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="aquapy-io")
+        self._drainers: List[asyncio.Task] = []
+        self._lock = threading.Lock()
+        self._dirs: set = set()
+        self._unsynced: List[str] = []
+
+    def body_path(self, path: str) -> str:
+        return path + COMPRESSION_SUFFIX[self.compression]
+
+    def _ensure_dir(self, path: str):
+        d = os.path.dirname(path)
+        if d in self._dirs:
+            return
+        os.makedirs(d, exist_ok=True)
+        with self._lock:
+            self._dirs.add(d)
+
+    def _encode(self, data: bytes) -> bytes:
+        if self.compression == "gzip":
+            return gzip.compress(data, compresslevel=6)
+        if self._zstd is not None:
+            return self._zstd.compress(data)
+        return data
+
+    def _write(self, path: str, data: bytes, compress: bool):
+        self._ensure_dir(path)
+        with open(path, "wb") as f:
+            f.write(self._encode(data) if compress else data)
+        batch = None
+        with self._lock:
+            self.written += 1
+            if self.fsync_batch > 0:
+                self._unsynced.append(path)
+                if len(self._unsynced) >= self.fsync_batch:
+                    batch, self._unsynced = self._unsynced, []
+        if batch:
+            self._fsync(batch)
+
+    @staticmethod
+    def _fsync(paths: List[str]):
+        for p in paths:
+            try:
+                fd = os.open(p, os.O_RDONLY)
+                try: os.fsync(fd)
+                finally: os.close(fd)
+            except OSError:
+                pass
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._q.get()
+            if job is None:
+                break
+            try:
+                await loop.run_in_executor(self._pool, self._write, *job)
+            except Exception:
+                self.errors += 1
+
+    async def write_bytes(self, path: str, data: bytes, compress: bool = False):
+        if not self._drainers:
+            self._drainers = [asyncio.create_task(self._drain()) for _ in range(self._workers)]
+        await self._q.put((path, data, compress))
+
+    async def write_text(self, path: str, text: str):
+        await self.write_bytes(path, text.encode("utf-8"))
+
+    async def aclose(self):
+        if self._drainers:
+            for _ in self._drainers:
+                await self._q.put(None)
+            await asyncio.gather(*self._drainers)
+            self._drainers = []
+        if self._unsynced:
+            batch, self._unsynced = self._unsynced, []
+            await asyncio.get_running_loop().run_in_executor(self._pool, self._fsync, batch)
+        self._pool.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+def locate_artifact(path: str, src: str) -> Optional[str]:
+    # paths are stored as the run wrote them (its cwd, its -out, maybe another machine): find the file under src
+    if os.path.exists(path):
+        return path
+    parts = Path(path).parts
+    for i in range(1, len(parts)):
+        cand = os.path.join(src, *parts[i:])
+        if os.path.exists(cand):
+            return cand
+    return None
+
+def relocate_artifact(path: Optional[str], src: str, out_dir: str, link: bool = True) -> Optional[str]:
+    # artifacts are rebased from another run's output dir into out_dir; hard links when possible, copies otherwise
+    if not path:
+        return path
+    src_path = locate_artifact(path, src)
+    if src_path is None:
+        return path
+    rel = os.path.relpath(os.path.abspath(src_path), os.path.abspath(src))
+    if rel.startswith(".."):
+        return path  # outside the source dir: leave it where it is
+    dst = os.path.join(out_dir, rel)
+    if os.path.abspath(dst) == os.path.abspath(src_path):
+        return dst
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        if not link: raise OSError
+        os.link(src_path, dst)
+    except OSError:
+        shutil.copy2(src_path, dst)
+    return dst
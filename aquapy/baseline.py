@@ -0,0 +1,133 @@
+from __future__ import annotations
+import dataclasses, os, shutil
+from typing import Dict, Iterable, List, Optional
+from .artifacts import locate_artifact, relocate_artifact
+from .models import Entry, PreflightResult, ShotResult
+from .session import find_session, iter_session
+
+# -baseline: a previous session drives an incremental rescan. Probes revalidate with the stored
+# ETag/Last-Modified, and an endpoint whose status, title and body hash are unchanged keeps its old
+# screenshot (hard-linked into the new output dir) instead of going through Chromium again.
+
+CHANGE_FIELDS = ("status", "title", "body")
+# under -out, where the baseline's artifacts are kept when the run writes into the baseline's own dir
+DETACHED_DIR = "baseline"
+
+def _fields(p: PreflightResult) -> dict:
+    return {"status": p.status, "title": p.title, "body": p.body_sha256}
+
+class Baseline:
+    def __init__(self, entries: Iterable[Entry], src_dir: str, path: Optional[str] = None):
+        self.src_dir = src_dir
+        self.path = path
+        self.entries: Dict[str, Entry] = {e.preflight.url: e for e in entries}
+
+    @classmethod
+    def load(cls, src: str) -> "Baseline":
+        path = find_session(src)
+        return cls(iter_session(path), os.path.dirname(os.path.abspath(path)), path=path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def detach(self, out_dir: str):
+        """When the run writes into the baseline's own dir, move the baseline's artifacts into
+        out_dir/baseline first: new screenshots, headers and bodies reuse the same file names and
+        would otherwise overwrite the "before" side of the diff. Moved, not hard-linked, since
+        writers truncate files in place."""
+        if not os.path.isdir(out_dir) or not os.path.samefile(self.src_dir, out_dir):
+            return
+        dst = os.path.join(out_dir, DETACHED_DIR)
+        shutil.rmtree(dst, ignore_errors=True)  # the previous run's snapshot, superseded by this baseline
+        moved: Dict[str, str] = {}  # dedup aliases share their primary's screenshot
+        def move(path: Optional[str]) -> Optional[str]:
+            if path in moved:
+                return moved[path]
+            src_path = locate_artifact(path, self.src_dir) if path else None
+            if src_path is None:
+                return path
+            rel = os.path.relpath(os.path.abspath(src_path), os.path.abspath(self.src_dir))
+            if rel.startswith("..") or rel.split(os.sep, 1)[0] == DETACHED_DIR:
+                return path
+            target = os.path.join(dst, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(src_path, target)
+            moved[path] = target
+            return target
+        for url, e in self.entries.items():
+            pre = dataclasses.replace(e.preflight, headers_path=move(e.preflight.headers_path), body_path=move(e.preflight.body_path))
+            shot = dataclasses.replace(e.shot, path=move(e.shot.path), thumb_path=move(e.shot.thumb_path)) if e.shot else None
+            self.entries[url] = Entry(preflight=pre, shot=shot)
+        self.src_dir = dst
+
+    def validators(self, url: str) -> Optional[dict]:
+        # conditional request headers from the stored response; only a 2xx is worth revalidating
+        e = self.entries.get(url)
+        if e is None or not e.preflight.ok or not 200 <= (e.preflight.status or 0) < 300:
+            return None
+        stored = {k.lower(): v for k, v in e.preflight.headers.items()}
+        out = {}
+        if "etag" in stored:
+            out["If-None-Match"] = stored["etag"]
+        if "last-modified" in stored:
+            out["If-Modified-Since"] = stored["last-modified"]
+        return out or None
+
+    def revalidated(self, pre: PreflightResult, out_dir: str) -> PreflightResult:
+        # 304 Not Modified: the stored preflight (title, headers, technologies, body) still holds
+        old = self.entries[pre.url].preflight
+        return dataclasses.replace(
+            old, timings=pre.timings, revalidated=True,
+            headers_path=relocate_artifact(old.headers_path, self.src_dir, out_dir),
+            body_path=relocate_artifact(old.body_path, self.src_dir, out_dir),
+            technologies=list(old.technologies), headers=dict(old.headers),
+        )
+
+    def reuse_shot(self, pre: PreflightResult, out_dir: str) -> Optional[ShotResult]:
+        # the old screenshot stands in if the page is unchanged and its file is still there
+        e = self.entries.get(pre.url)
+        if e is None or e.shot is None or e.shot.error or not e.shot.path:
+            return None
+        if not pre.revalidated and (not pre.body_sha256 or _fields(pre) != _fields(e.preflight)):
+            return None
+        path = relocate_artifact(e.shot.path, self.src_dir, out_dir)
+        if not os.path.exists(path):
+            return None
+        return dataclasses.replace(e.shot, path=path, thumb_path=relocate_artifact(e.shot.thumb_path, self.src_dir, out_dir), cluster_id=None, timings={}, reused=True)
+
+    def _old_shot(self, e: Entry) -> Optional[str]:
+        if e.shot is None or e.shot.error or not e.shot.path:
+            return None
+        return locate_artifact(e.shot.path, self.src_dir)
+
+    def diff(self, entries: Iterable[Entry]) -> dict:
+        """Compare a run against the baseline by target URL: new (responding now, not before),
+        changed (status, title or body hash differ), gone (responded before, not now)."""
+        new: List[dict] = []; changed: List[dict] = []; gone: List[dict] = []
+        unchanged = 0; ok_now = set(); failed: Dict[str, Optional[str]] = {}
+        for e in entries:
+            p = e.preflight
+            if not p.ok:
+                failed[p.url] = p.error_kind or p.reason
+                continue
+            ok_now.add(p.url)
+            old = self.entries.get(p.url)
+            row = {"url": p.url, "final_url": p.final_url, "status": p.status, "title": p.title,
+                   "screenshot": e.shot.path if e.shot and not e.shot.error else None}
+            if old is None or not old.preflight.ok:
+                new.append(row)
+                continue
+            before, after = _fields(old.preflight), _fields(p)
+            # sessions written before body hashing have none: judge those on status and title only
+            fields = [f for f in CHANGE_FIELDS if before[f] != after[f] and not (f == "body" and None in (before[f], after[f]))]
+            if not fields:
+                unchanged += 1
+                continue
+            row.update(fields=fields, before_status=old.preflight.status, before_title=old.preflight.title,
+                       before_screenshot=self._old_shot(old))
+            changed.append(row)
+        for url, old in self.entries.items():
+            if old.preflight.ok and url not in ok_now:
+                gone.append({"url": url, "final_url": old.preflight.final_url, "status": old.preflight.status, "title": old.preflight.title,
+                             "error": failed.get(url), "screenshot": self._old_shot(old)})
+        return {"baseline": self.path, "new": new, "changed": changed, "gone": gone, "unchanged": unchanged}
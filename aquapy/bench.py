@@ -0,0 +1,291 @@
+"""Offline benchmark suite: a local HTTP/HTTPS stand-in fleet plus timed runs of the hot paths.
+
+    python -m aquapy.bench [-suites probe,fingerprint,cluster,report,screenshot] [-ports 64] [-probe-n 2000] [-json out.json]
+    python -m aquapy.bench -serve [-ports 64]      # just run the fleet and print its target URLs (for driving the CLI)
+
+Each suite reports items/sec, p50/p99 latency per item and the peak RSS of the process so far.
+"""
+from __future__ import annotations
+import argparse, asyncio, json, os, random, resource, shutil, socket, ssl, subprocess, sys, tempfile, time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+from .models import Entry, PreflightResult, ShotResult, Target
+
+ROLES = ("fast", "fast", "slow", "redirect", "large", "https")  # round-robin over the fleet's ports
+
+PAGE = ("<!doctype html><html><head><title>bench {port}</title>"
+        "<link rel='stylesheet' href='/wp-content/themes/x/style.css'></head>"
+        "<body><h1>port {port}</h1>{filler}<script src='/wp-includes/js/jquery.js'></script></body></html>")
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def _pct(xs: List[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+@dataclass
+class BenchResult:
+    suite: str
+    n: int
+    seconds: float
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    note: str = ""
+
+    def row(self) -> dict:
+        return {"suite": self.suite, "n": self.n, "seconds": round(self.seconds, 3),
+                "per_sec": round(self.n / self.seconds, 1) if self.seconds > 0 else 0.0,
+                "p50_ms": round(_pct(self.latencies, 50) * 1000, 2), "p99_ms": round(_pct(self.latencies, 99) * 1000, 2),
+                "errors": self.errors, "peak_rss_mb": round(peak_rss_mb(), 1), "note": self.note}
+
+def self_signed_cert(directory: str) -> Optional[Tuple[str, str]]:
+    openssl = shutil.which("openssl")
+    if not openssl:
+        return None
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    try:
+        subprocess.run([openssl, "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert, "-days", "2",
+                        "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return cert, key
+
+class Fleet:
+    """Local stand-in for a scope: many listening ports with different behaviours
+    (fast, slow, redirecting, large-body, self-signed HTTPS) plus a few closed ports."""
+
+    def __init__(self, ports: int = 64, closed: int = 8, slow_ms: int = 300, large_kb: int = 2048, host: str = "127.0.0.1"):
+        self.n_ports = ports
+        self.n_closed = closed
+        self.slow = slow_ms / 1000
+        self.large = large_kb * 1024
+        self.host = host
+        self.ports: List[Tuple[int, str]] = []
+        self.closed: List[int] = []
+        self._servers: List[asyncio.AbstractServer] = []
+        self._tmp = tempfile.mkdtemp(prefix="aquapy-fleet-")
+        self.filler = "<p>" + " ".join(["lorem ipsum dolor sit amet"] * 40) + "</p>"
+
+    async def start(self) -> "Fleet":
+        ctx = None
+        pair = self_signed_cert(self._tmp)
+        if pair:
+            ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ctx.load_cert_chain(*pair)
+        for i in range(self.n_ports):
+            role = ROLES[i % len(ROLES)]
+            if role == "https" and ctx is None:
+                role = "fast"  # no openssl: fall back to plain HTTP
+            server = await asyncio.start_server(lambda r, w, role=role: self._serve(r, w, role), self.host, 0, ssl=ctx if role == "https" else None, backlog=1024)
+            self._servers.append(server)
+            self.ports.append((server.sockets[0].getsockname()[1], role))
+        for _ in range(self.n_closed):
+            # bound then released: nothing listens there for the rest of the run (barring port reuse)
+            with socket.socket() as s:
+                s.bind((self.host, 0)); self.closed.append(s.getsockname()[1])
+        return self
+
+    async def close(self):
+        for s in self._servers:
+            s.close()
+        for s in self._servers:
+            await s.wait_closed()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def urls(self, include_closed: bool = True) -> List[str]:
+        out = [f"{'https' if role == 'https' else 'http'}://{self.host}:{port}/" for port, role in self.ports]
+        if include_closed:
+            out += [f"http://{self.host}:{port}/" for port in self.closed]
+        return out
+
+    def targets(self, n: int, include_closed: bool = True) -> List[Target]:
+        # n distinct URLs cycling over the fleet (distinct paths, so nothing dedupes them away)
+        urls = self.urls(include_closed)
+        return [Target(host=self.host, url=f"{urls[i % len(urls)]}p{i}") for i in range(n)]
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, role: str):
+        port = writer.get_extra_info("sockname")[1]
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                path = head.split(b" ", 2)[1].decode("latin-1") if head.count(b" ") >= 2 else "/"
+                status, extra, body = 200, "", PAGE.format(port=port, filler=self.filler).encode()
+                if role == "slow":
+                    await asyncio.sleep(self.slow)
+                elif role == "redirect" and not path.startswith("/final"):
+                    status, extra, body = 302, f"Location: /final{path}\r\n", b""
+                elif role == "large":
+                    body = PAGE.format(port=port, filler=self.filler * max(1, self.large // len(self.filler))).encode()
+                reason = "OK" if status == 200 else "Found"
+                writer.write(f"HTTP/1.1 {status} {reason}\r\nServer: nginx/1.25.0\r\nX-Powered-By: WordPress\r\nContent-Type: text/html; charset=utf-8\r\nContent-Length: {len(body)}\r\n{extra}\r\n".encode() + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+async def bench_probe(fleet: Fleet, n: int, concurrency: int, out_dir: str) -> BenchResult:
+    from .http_client import ClientManager
+    from .artifacts import ArtifactSink
+    from .fingerprints import load_fingerprinter
+    from .probe import probe_target
+    fp = load_fingerprinter(str(Path(__file__).with_name("assets") / "wappalyzer_min.json"))
+    targets = fleet.targets(n)
+    lat: List[float] = []; errors = 0
+    sem = asyncio.Semaphore(concurrency)
+    async with ClientManager(max_connections=concurrency, max_keepalive=concurrency, verify=False) as clients, ArtifactSink(out_dir) as sink:
+        async def one(t: Target):
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                pre = await probe_target(t, timeout_ms=3000, save_body=True, out_dir=out_dir, retries_http=0, follow_redirects=True, clients=clients, fingerprinter=fp, sink=sink)
+                lat.append(time.perf_counter() - t0)
+                if not pre.ok: errors += 1
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(t) for t in targets))
+        dt = time.perf_counter() - t0
+    return BenchResult("probe", n, dt, lat, errors, note=f"{len(fleet.closed)} of {len(fleet.ports) + len(fleet.closed)} ports closed")
+
+async def bench_screenshot(fleet: Fleet, n: int, out_dir: str) -> BenchResult:
+    from .screenshot import screenshot_url
+    urls = [u for u in fleet.urls(include_closed=False)][:max(1, n)]
+    lat: List[float] = []; errors = 0; first_error = ""
+    t0 = time.perf_counter()
+    for i, url in enumerate(urls):
+        s0 = time.perf_counter()
+        shot = await screenshot_url(url, os.path.join(out_dir, f"shot{i}.png"), 1440, 900, "aquapy-bench", timeout_ms=10000, retries=0)
+        lat.append(time.perf_counter() - s0)
+        if shot.error:
+            errors += 1; first_error = first_error or shot.error.splitlines()[0][:80]
+    return BenchResult("screenshot", len(urls), time.perf_counter() - t0, lat, errors, note=first_error)
+
+def bench_fingerprint(n: int, body_kb: int) -> BenchResult:
+    from .fingerprints import load_fingerprinter
+    fp = load_fingerprinter(str(Path(__file__).with_name("assets") / "wappalyzer_min.json"))
+    rng = random.Random(1)
+    filler = "".join(rng.choice("abcdefghij <>/=\"") for _ in range(body_kb * 1024))
+    bodies = [PAGE.format(port=i, filler=filler) for i in range(16)]
+    headers = {"server": "nginx/1.25.0", "x-powered-by": "WordPress", "content-type": "text/html"}
+    lat: List[float] = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        s0 = time.perf_counter(); fp.detect(headers=headers, html=bodies[i % len(bodies)]); lat.append(time.perf_counter() - s0)
+    return BenchResult("fingerprint", n, time.perf_counter() - t0, lat)
+
+def bench_cluster(n: int, threshold: int) -> BenchResult:
+    from .cluster import cluster_phashes
+    rng = random.Random(1)
+    base = [rng.getrandbits(64) for _ in range(max(1, n // 50))]
+    items = []
+    for idx in range(n):
+        v = rng.choice(base)
+        for _ in range(rng.randint(0, 12)):
+            v ^= 1 << rng.randrange(64)
+        items.append((idx, f"{v:016x}"))
+    t0 = time.perf_counter()
+    out = cluster_phashes(items, threshold=threshold)
+    dt = time.perf_counter() - t0
+    return BenchResult("cluster", n, dt, [dt], note=f"{len(set(out.values()))} clusters")
+
+def bench_report(n: int, out_dir: str, mode: str) -> BenchResult:
+    from .report import render_report
+    rng = random.Random(1)
+    entries = []
+    for i in range(n):
+        url = f"http://host{i % 997}.bench:{rng.choice([80, 443, 8080])}/p{i}"
+        pre = PreflightResult(url=url, ok=True, status=rng.choice([200, 301, 403, 404, 500]), reason="OK", headers={"server": "nginx", "content-type": "text/html", "x-request-id": f"{rng.getrandbits(64):x}"},
+                              title=f"Bench page {i}", final_url=url, technologies=[{"name": "Nginx", "slug": "nginx", "categories": ["Web Server"], "score": 2}])
+        shot = ShotResult(url=url, path=os.path.join(out_dir, "screenshots", f"{i}.png"), width=1440, height=900, phash=f"{rng.getrandbits(64):016x}", cluster_id=1 + i % 40)
+        entries.append(Entry(preflight=pre, shot=shot))
+    t0 = time.perf_counter()
+    path = render_report(entries, out_dir, str(Path(__file__).with_name("templates")), mode=mode)
+    dt = time.perf_counter() - t0
+    size = os.path.getsize(path)
+    return BenchResult("report", n, dt, [dt], note=f"mode={mode} html={size / 1024:.0f}KB")
+
+def print_table(rows: List[dict]):
+    cols = ["suite", "n", "seconds", "per_sec", "p50_ms", "p99_ms", "errors", "peak_rss_mb", "note"]
+    print("  ".join(f"{c:>11}" if c != "note" else c for c in cols))
+    for r in rows:
+        print("  ".join(f"{str(r[c]):>11}" if c != "note" else str(r[c]) for c in cols))
+
+async def run_suites(args) -> List[dict]:
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    out_dir = tempfile.mkdtemp(prefix="aquapy-bench-")
+    rows = []
+    try:
+        async with Fleet(ports=args.ports, closed=args.closed, slow_ms=args.slow_ms, large_kb=args.large_kb) as fleet:
+            for suite in suites:
+                if suite == "probe":
+                    res = await bench_probe(fleet, args.probe_n, args.concurrency, out_dir)
+                elif suite == "screenshot":
+                    res = await bench_screenshot(fleet, args.shots, out_dir)
+                elif suite == "fingerprint":
+                    res = bench_fingerprint(args.fp_n, args.body_kb)
+                elif suite == "cluster":
+                    res = bench_cluster(args.cluster_n, args.phash_threshold)
+                elif suite == "report":
+                    res = bench_report(args.report_n, out_dir, args.report_mode)
+                else:
+                    raise SystemExit(f"Unknown suite: {suite}")
+                rows.append(res.row())
+                if not args.quiet:
+                    print(f"{suite}: done", file=sys.stderr)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return rows
+
+async def serve(args):
+    async with Fleet(ports=args.ports, closed=args.closed, slow_ms=args.slow_ms, large_kb=args.large_kb) as fleet:
+        for url in fleet.urls():
+            print(url)
+        sys.stdout.flush()
+        print(f"serving {len(fleet.ports)} ports ({len(fleet.closed)} closed), Ctrl-C to stop", file=sys.stderr)
+        await asyncio.Event().wait()
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(prog="python -m aquapy.bench", description=__doc__.splitlines()[0])
+    ap.add_argument("-suites", default="probe,fingerprint,cluster,report", help="Comma list of probe,screenshot,fingerprint,cluster,report (default all but screenshot)")
+    ap.add_argument("-ports", type=int, default=64, help="Listening ports in the fleet (default 64)")
+    ap.add_argument("-closed", type=int, default=8, help="Closed ports mixed into the targets (default 8)")
+    ap.add_argument("-slow-ms", dest="slow_ms", type=int, default=300, help="Delay of the slow responders (default 300)")
+    ap.add_argument("-large-kb", dest="large_kb", type=int, default=2048, help="Body size of the large responders (default 2048)")
+    ap.add_argument("-probe-n", dest="probe_n", type=int, default=2000, help="probe_target calls (default 2000)")
+    ap.add_argument("-concurrency", type=int, default=64, help="Concurrent probes (default 64)")
+    ap.add_argument("-shots", type=int, default=5, help="screenshot_url calls (default 5)")
+    ap.add_argument("-fp-n", dest="fp_n", type=int, default=2000, help="Fingerprinter.detect calls (default 2000)")
+    ap.add_argument("-body-kb", dest="body_kb", type=int, default=64, help="HTML body size for fingerprinting (default 64)")
+    ap.add_argument("-cluster-n", dest="cluster_n", type=int, default=20000, help="pHashes to cluster (default 20000)")
+    ap.add_argument("-phash-threshold", dest="phash_threshold", type=int, default=10)
+    ap.add_argument("-report-n", dest="report_n", type=int, default=5000, help="Entries in the rendered report (default 5000)")
+    ap.add_argument("-report-mode", dest="report_mode", choices=["auto", "full", "sharded"], default="auto")
+    ap.add_argument("-json", dest="json_out", help="Also write the result rows as JSON (for comparing runs)")
+    ap.add_argument("-serve", action="store_true", help="Only start the fleet, print its URLs and serve until interrupted")
+    ap.add_argument("-quiet", action="store_true")
+    args = ap.parse_args(argv)
+    try:
+        if args.serve:
+            asyncio.run(serve(args))
+            return
+        rows = asyncio.run(run_suites(args))
+    except KeyboardInterrupt:
+        return
+    print_table(rows)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "time": time.time(), "results": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Callable, List, Optional
+from playwright.async_api import async_playwright
+
+class _Slot:
+    def __init__(self, index: int):
+        self.index = index
+        self.browser = None
+        self.stale = None
+        self.leased = 0
+        self.served = 0
+        self.retiring = False
+        self.idle: list = []
+        self.lock = asyncio.Lock()
+
+    def alive(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+class BrowserPool:
+    def __init__(self, browsers: int = 2, pages_per_browser: int = 4, recycle_after: int = 250, chrome_path: Optional[str] = None, launch_args: Optional[List[str]] = None, resolver_rules: Optional[Callable[[], Optional[str]]] = None):
+        self.browsers = max(1, browsers)
+        self.pages_per_browser = max(1, pages_per_browser)
+        self.recycle_after = max(1, recycle_after)
+        self.chrome_path = chrome_path
+        self.launch_args = launch_args or []
+        self.resolver_rules = resolver_rules
+        self.launches = 0
+        self._pw = None
+        self._slots = [_Slot(i) for i in range(self.browsers)]
+        self._cond = asyncio.Condition()
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.browsers * self.pages_per_browser
+
+    async def start(self):
+        async with self._start_lock:
+            if self._pw is None:
+                self._pw = await async_playwright().start()
+        return self
+
+    async def close(self):
+        for s in self._slots:
+            for b in (s.stale, s.browser):
+                if b is not None:
+                    try: await b.close()
+                    except Exception: pass
+            s.browser = s.stale = None; s.idle = []
+        if self._pw is not None:
+            try: await self._pw.stop()
+            except Exception: pass
+            self._pw = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _free_slot(self) -> Optional[_Slot]:
+        best = None
+        for s in self._slots:
+            if s.retiring and s.leased == 0:
+                # drained: hand the old browser to _ensure for closing and start over
+                s.stale, s.browser = s.browser, None
+                s.retiring = False; s.served = 0; s.idle = []
+            if s.retiring or s.leased >= self.pages_per_browser:
+                continue
+            if best is None or s.leased < best.leased:
+                best = s
+        return best
+
+    async def _acquire(self) -> _Slot:
+        async with self._cond:
+            while True:
+                slot = self._free_slot()
+                if slot is not None:
+                    slot.leased += 1
+                    return slot
+                await self._cond.wait()
+
+    async def _ensure(self, slot: _Slot):
+        async with slot.lock:
+            if slot.stale is not None:
+                stale, slot.stale = slot.stale, None
+                try: await stale.close()
+                except Exception: pass
+            if slot.alive():
+                return
+            if slot.browser is not None:
+                # crashed or disconnected underneath us
+                slot.browser = None; slot.idle = []; slot.served = 0
+            await self.start()
+            launch_kwargs = {"headless": True, "args": ["--no-sandbox", *self.launch_args]}
+            rules = self.resolver_rules() if self.resolver_rules else None
+            if rules:
+                # refreshed on every (re)launch, so recycled browsers pick up newly resolved hosts
+                launch_kwargs["args"].append(f"--host-resolver-rules={rules}")
+            if self.chrome_path:
+                launch_kwargs["executable_path"] = self.chrome_path
+            slot.browser = await self._pw.chromium.launch(**launch_kwargs)
+            self.launches += 1
+
+    async def _release(self, slot: _Slot, key, ctx, page, ok: bool):
+        reuse = ok and ctx is not None and slot.alive() and not page.is_closed()
+        slot.served += 1
+        if slot.served >= self.recycle_after:
+            slot.retiring = True
+        if reuse and not slot.retiring:
+            try:
+                await page.goto("about:blank")
+                await ctx.clear_cookies()
+                slot.idle.append((key, ctx, page))
+            except Exception:
+                reuse = False
+        if not reuse and ctx is not None:
+            try: await ctx.close()
+            except Exception: pass
+        if slot.retiring:
+            idle, slot.idle = slot.idle, []
+            for _, c, _ in idle:
+                try: await c.close()
+                except Exception: pass
+        async with self._cond:
+            slot.leased -= 1
+            self._cond.notify_all()
+
+    async def _new_page(self, slot: _Slot, key):
+        viewport, user_agent, proxy = key
+        context_kwargs = {"viewport": dict(viewport), "user_agent": user_agent, "ignore_https_errors": True}
+        if proxy:
+            context_kwargs["proxy"] = {"server": proxy}
+        ctx = await slot.browser.new_context(**context_kwargs)
+        try:
+            return ctx, await ctx.new_page()
+        except Exception:
+            await ctx.close()
+            raise
+
+    @asynccontextmanager
+    async def page(self, viewport: dict, user_agent: str, proxy: Optional[str] = None):
+        key = (tuple(sorted(viewport.items())), user_agent, proxy)
+        slot = await self._acquire()
+        ctx = page = None; ok = False
+        try:
+            await self._ensure(slot)
+            while slot.idle and ctx is None:
+                k, c, p = slot.idle.pop()
+                if k == key and not p.is_closed():
+                    ctx, page = c, p
+                else:
+                    try: await c.close()
+                    except Exception: pass
+            if ctx is None:
+                ctx, page = await self._new_page(slot, key)
+            yield page
+            ok = True
+        finally:
+            await self._release(slot, key, ctx, page, ok)
@@ -1,5 +1,21 @@
 from __future__ import annotations
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+from functools import lru_cache
+from itertools import combinations
+from math import comb
+from .models import Entry
+
+@lru_cache(maxsize=None)
+def _numpy():
+    # optional vectorized popcount path; imported on the first large clustering, not at startup
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+_NUMPY_MIN = 2000
+_BLOCK = 64
 
 def _hex_to_bits(h: str) -> int:
     return int(h, 16)
@@ -10,7 +26,74 @@ def hamming(a_hex: str, b_hex: str) -> int:
     except Exception:
         return 64
 
-def cluster_phashes(items: List[Tuple[int, str]], threshold: int = 10) -> Dict[int, int]:
+def _mih_layout(width: int, threshold: int, n: int) -> Optional[Tuple[int, int]]:
+    # pigeonhole: split into m chunks of b bits; hashes within `threshold` differ in <= threshold//m bits on some chunk
+    best = None
+    for want in range(1, 17):
+        b = -(-width // want); m = -(-width // b); r = threshold // m
+        if b > 32 or r > 4:
+            continue
+        smallest = width - b * (m - 1)
+        probes = m * sum(comb(b, k) for k in range(r + 1))
+        cost = probes * (1 + n / 2.0 ** smallest)
+        if best is None or cost < best[0]:
+            best = (cost, b, r)
+    return (best[1], best[2]) if best else None
+
+def _pairs_mih(values: List[int], threshold: int):
+    width = max(64, max(values).bit_length())
+    layout = _mih_layout(width, threshold, len(values))
+    if layout is None:
+        # threshold too large for any useful split: plain scan
+        for i, v in enumerate(values):
+            for u in values[:i]:
+                if (u ^ v).bit_count() <= threshold:
+                    yield v, u
+        return
+    b, r = layout
+    chunks = []
+    for j in range(-(-width // b)):
+        shift = j * b; bits = min(b, width - shift)
+        masks = [sum(1 << k for k in ks) for d in range(r + 1) for ks in combinations(range(bits), d)]
+        chunks.append((shift, (1 << bits) - 1, masks, {}))
+    for v in values:
+        seen = set()
+        for shift, cmask, masks, table in chunks:
+            cv = (v >> shift) & cmask
+            for mm in masks:
+                for u in table.get(cv ^ mm, ()):
+                    if u not in seen:
+                        seen.add(u)
+                        if (u ^ v).bit_count() <= threshold:
+                            yield v, u
+        for shift, cmask, _, table in chunks:
+            table.setdefault((v >> shift) & cmask, []).append(v)
+
+@lru_cache(maxsize=None)
+def _popcount8():
+    np = _numpy()
+    return np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _popcount64(x):
+    np = _numpy()
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return _popcount8()[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1)
+
+def _pairs_numpy(values: List[int], threshold: int):
+    np = _numpy()
+    arr = np.array(values, dtype=np.uint64)
+    n = len(arr)
+    for start in range(0, n, _BLOCK):
+        rows = arr[start:start+_BLOCK]
+        # upper triangle only: compare this block against itself and everything after it
+        d = _popcount64(rows[:, None] ^ arr[None, start:])
+        ri, cj = np.nonzero(d <= threshold)
+        for r, c in zip(ri.tolist(), cj.tolist()):
+            if c > r:
+                yield values[start + r], values[start + c]
+
+def cluster_phashes(items: List[Tuple[int, str]], threshold: int = 10, method: str = "auto") -> Dict[int, int]:
     parent = {i:i for i,_ in items}
     def find(x):
         while parent[x] != x:
@@ -20,11 +103,31 @@ def cluster_phashes(items: List[Tuple[int, str]], threshold: int = 10) -> Dict[i
     def union(a,b):
         ra, rb = find(a), find(b)
         if ra != rb: parent[rb] = ra
-    for i in range(len(items)):
-        for j in range(i+1, len(items)):
-            ei, hi = items[i]; ej, hj = items[j]
-            if hi and hj and hamming(hi, hj) <= threshold:
-                union(ei, ej)
+    # parse each hash once; identical hashes collapse to one neighbour search
+    by_value: Dict[int, int] = {}
+    invalid: List[int] = []
+    for idx, h in items:
+        if not h:
+            continue
+        try:
+            v = _hex_to_bits(h)
+        except Exception:
+            invalid.append(idx); continue
+        if v in by_value: union(by_value[v], idx)
+        else: by_value[v] = idx
+    values = list(by_value)
+    if threshold >= 0 and len(values) > 1:
+        use_numpy = method == "numpy" or (method == "auto" and len(values) >= _NUMPY_MIN)
+        if use_numpy and (_numpy() is None or max(values).bit_length() > 64):
+            use_numpy = False
+        pairs = _pairs_numpy(values, threshold) if use_numpy else _pairs_mih(values, threshold)
+        for a, b in pairs:
+            union(by_value[a], by_value[b])
+    # unparseable hashes sit at distance 64 from everything, as hamming() reports
+    if invalid and threshold >= 64:
+        anchor: Optional[int] = invalid[0]
+        for idx in invalid[1:] + [by_value[v] for v in values]:
+            union(anchor, idx)
     roots = {}; next_id = 1; out = {}
     for idx,_ in items:
         r = find(idx)
@@ -32,3 +135,14 @@ def cluster_phashes(items: List[Tuple[int, str]], threshold: int = 10) -> Dict[i
             roots[r] = next_id; next_id += 1
         out[idx] = roots[r]
     return out
+
+def assign_clusters(entries: List[Entry], threshold: int):
+    items = []
+    for idx, e in enumerate(entries):
+        ph = e.shot.phash if (e.shot and e.shot.phash) else None
+        if ph:
+            items.append((idx, ph))
+    mapping = cluster_phashes(items, threshold=threshold) if items else {}
+    for idx, cid in mapping.items():
+        if entries[idx].shot:
+            entries[idx].shot.cluster_id = cid
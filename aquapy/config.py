@@ -32,3 +32,38 @@ class Settings:
     retries_shot: int = 1
     phash_threshold: int = 10
     follow_redirects: bool = False
+    # per-host scheduler (0 = unlimited)
+    per_host: int = 2
+    rate: float = 0
+    # tcp pre-scan
+    port_scan: bool = True
+    scan_concurrency: int = 512
+    # artifact writer
+    max_body_size: int = 5 * 1024 * 1024
+    body_compression: str = "none"
+    io_workers: int = 4
+    fsync_batch: int = 256
+    # dns cache
+    dns_ttl: int = 300
+    dns_concurrency: int = 64
+    # http client pool
+    max_connections: int = 100
+    max_keepalive: int = 20
+    http2: bool = False
+    # browser pool
+    browsers: int = 2
+    pages_per_browser: int = 4
+    browser_recycle: int = 250
+    image_workers: int = 2
+    # screenshot output
+    screenshot_format: str = "png"
+    screenshot_quality: int = 80
+    thumb_width: int = 480
+    # render endpoints sharing final URL + body once
+    dedup: bool = True
+    # instrumentation (progress_interval 0 = no progress line)
+    progress_interval: float = 10
+    metrics_file: Optional[str] = None
+    # pipeline stages (0 = derive from concurrency / browser pool)
+    probe_concurrency: int = 0
+    screenshot_concurrency: int = 0
@@ -0,0 +1,65 @@
+from __future__ import annotations
+import dataclasses
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from .models import Entry, PreflightResult, ShotResult
+
+# between probe and screenshot: endpoints that land on the same final URL with the same body
+# (http:80 -> https:443, www aliases, CDN edges) are rendered once; the others become aliases of that shot
+
+Key = Tuple[str, str]
+
+class ShotDedup:
+    def __init__(self, emit: Callable[[Entry], None]):
+        self.emit = emit
+        self.aliases = 0
+        # key -> preflights waiting on the first render, or its ShotResult once done
+        self._slots: Dict[Key, Union[List[PreflightResult], ShotResult]] = {}
+        self._primary: Dict[Key, str] = {}
+
+    @staticmethod
+    def key(pre: PreflightResult) -> Optional[Key]:
+        if not pre.body_sha256:
+            return None
+        return (pre.final_url or pre.url, pre.body_sha256)
+
+    def offer(self, pre: PreflightResult) -> bool:
+        """True if pre should be screenshotted; otherwise it is linked to the shot of the
+        first endpoint with the same key, now or when that shot completes."""
+        key = self.key(pre)
+        if key is None:
+            return True
+        slot = self._slots.get(key)
+        if slot is None:
+            self._slots[key] = []
+            self._primary[key] = pre.url
+            return True
+        if isinstance(slot, list):
+            slot.append(pre)
+        else:
+            self._link(pre, slot, self._primary[key])
+        return False
+
+    def resolve(self, pre: PreflightResult, shot: ShotResult) -> Optional[PreflightResult]:
+        """Link the endpoints waiting on pre's render to shot. A failed render is not shared: the next
+        waiting endpoint becomes the primary and is returned, to be screenshotted in its place."""
+        key = self.key(pre)
+        if key is None or self._primary.get(key) != pre.url:
+            return None
+        waiting = self._slots.get(key)
+        if shot.error:
+            if isinstance(waiting, list) and waiting:
+                nxt = waiting.pop(0)
+                self._primary[key] = nxt.url
+                return nxt
+            # nobody waiting: a later endpoint with this key gets its own attempt
+            self._slots.pop(key, None)
+            self._primary.pop(key, None)
+            return None
+        self._slots[key] = shot
+        for alias in waiting if isinstance(waiting, list) else ():
+            self._link(alias, shot, pre.url)
+        return None
+
+    def _link(self, pre: PreflightResult, shot: ShotResult, primary: str):
+        self.aliases += 1
+        self.emit(Entry(preflight=pre, shot=dataclasses.replace(shot, timings={}, alias_of=primary)))
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import asyncio, ipaddress, socket, time
+from typing import Dict, List, Optional, Tuple
+import httpcore
+from .metrics import timed
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+TRANSIENT_RETRIES = 1
+_NEGATIVE_ERRNOS = {getattr(socket, n) for n in ("EAI_NONAME", "EAI_NODATA", "EAI_ADDRFAMILY") if hasattr(socket, n)}
+
+class DNSCache:
+    def __init__(self, ttl: float = 300, concurrency: int = 64):
+        self.ttl = ttl
+        self.lookups = 0
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._cache: Dict[str, Tuple[float, List[str]]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def cached(self, host: str) -> Optional[List[str]]:
+        hit = self._cache.get(host.lower())
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+        return None
+
+    def is_negative(self, host: str) -> bool:
+        return self.cached(host) == []
+
+    async def resolve(self, host: str) -> List[str]:
+        # [] means the lookup failed; NXDOMAIN/NODATA answers are cached like a positive one, transient failures are not
+        if _is_ip(host):
+            return [host.strip("[]")]
+        key = host.lower()
+        hit = self.cached(key)
+        if hit is not None:
+            return hit
+        fut = self._pending.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._lookup(key))
+            self._pending[key] = fut
+            fut.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(fut)
+
+    async def _lookup(self, host: str) -> List[str]:
+        # only a definite "no such name/no address" is negative-cached; a resolver hiccup (EAI_AGAIN, SERVFAIL,
+        # socket errors) is retried once and then reported uncached, so the next lookup asks again
+        async with self._sem:
+            for attempt in range(TRANSIENT_RETRIES + 1):
+                self.lookups += 1
+                try:
+                    infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+                    addrs = list(dict.fromkeys(i[4][0] for i in infos))
+                    break
+                except UnicodeError:
+                    addrs = []  # not a valid IDNA name: as permanent as NXDOMAIN
+                    break
+                except socket.gaierror as e:
+                    if e.errno in _NEGATIVE_ERRNOS:
+                        addrs = []
+                        break
+                except OSError:
+                    pass
+                if attempt < TRANSIENT_RETRIES:
+                    await asyncio.sleep(0.5)
+            else:
+                return []
+        self._cache[host] = (time.monotonic() + self.ttl, addrs)
+        return addrs
+
+    def host_resolver_rules(self, limit: int = 1000) -> Optional[str]:
+        # Chromium --host-resolver-rules: the most recent answers, so pooled browsers skip their own lookups
+        now = time.monotonic(); rules = []
+        for host, (exp, addrs) in reversed(list(self._cache.items())):
+            if exp <= now or "," in host or " " in host:
+                continue
+            if addrs:
+                ip = addrs[0]
+                rules.append(f"MAP {host} {'[' + ip + ']' if ':' in ip else ip}")
+            else:
+                rules.append(f"MAP {host} ~NOTFOUND")
+            if len(rules) >= limit:
+                break
+        return ", ".join(rules) if rules else None
+
+class ResolvingBackend(httpcore.AsyncNetworkBackend):
+    # httpcore network backend that connects to the cached address; TLS still uses the hostname for SNI
+    def __init__(self, backend: httpcore.AsyncNetworkBackend, dns: DNSCache):
+        self._backend = backend
+        self._dns = dns
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None, local_address: Optional[str] = None, socket_options=None):
+        with timed("dns"):
+            addrs = await self._dns.resolve(host)
+        if not addrs:
+            raise httpcore.ConnectError(f"[dns] name or service not known: {host}")
+        # every address in turn, as httpcore's own backend does: a dead first A/AAAA record must not sink the host
+        for i, addr in enumerate(addrs):
+            try:
+                return await self._backend.connect_tcp(addr, port, timeout=timeout, local_address=local_address, socket_options=socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout, OSError):
+                if i == len(addrs) - 1:
+                    raise
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
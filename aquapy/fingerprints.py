@@ -1,35 +1,324 @@
 from __future__ import annotations
-from typing import Dict, List
-import json
+from typing import Dict, List, Optional
+from functools import lru_cache
+import json, os, re
+
+# Wappalyzer pattern syntax: "regex\;version:\1\;confidence:50"
+_TAG_SEP = "\\;"
+_REGEX_META = re.compile(r"[\\^$.|?*+()\[\]{}]")
+_META_TAG_RE = re.compile(r"<meta\s[^>]*>", re.I)
+_ATTR_RE = re.compile(r"""([a-zA-Z:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""")
+_SCRIPT_SRC_RE = re.compile(r"""<script[^>]+src\s*=\s*["']?([^"'\s>]+)""", re.I)
+_INLINE_SCRIPT_RE = re.compile(r"<script(?![^>]*\ssrc\s*=)[^>]*>(.*?)</script\s*>", re.I | re.S)
+_TERNARY_RE = re.compile(r"\\(\d+)\?([^:]*):(.*)")
+_GROUP_RE = re.compile(r"\\(\d+)")
+_MAX_LITERAL = 200
+
+class _Pattern:
+    __slots__ = ("tech", "raw", "literal", "regex", "version", "confidence", "required")
+
+    def __init__(self, tech: int, raw: str, literal: bool = False):
+        parts = str(raw).split(_TAG_SEP)
+        self.tech = tech
+        self.raw = parts[0]
+        self.version = None
+        self.confidence = 100
+        for tag in parts[1:]:
+            if tag.startswith("version:"):
+                self.version = tag[8:]
+            elif tag.startswith("confidence:"):
+                try: self.confidence = int(tag[11:])
+                except ValueError: pass
+        if literal:
+            # not a valid regex here: matched as the plain fragment, so there are no groups for a version
+            self.version = None
+        self.literal = self.raw.lower() if (literal or not _REGEX_META.search(self.raw)) and not self.version else None
+        self.regex = None
+        self.required = None
+        if self.literal is None:
+            self.regex = re.compile(self.raw, re.I)
+            self.required = _required_literal(self.raw)
+
+    def search(self, text: str, lowered: str):
+        if self.literal is not None:
+            return self.literal in lowered
+        return self.regex.search(text)
+
+_ESCAPE_WIDTH = {"x": 2, "u": 4, "U": 8}
+
+def _skip_escape(rx: str, i: int) -> int:
+    # end of an alphanumeric escape at i (rx[i] == "\\"): classes, anchors, \xHH, \uHHHH, \N{...}, backrefs, octals
+    c = rx[i+1]
+    if c in _ESCAPE_WIDTH:
+        return i + 2 + _ESCAPE_WIDTH[c]
+    if c == "N" and rx[i+2:i+3] == "{":
+        j = rx.find("}", i+3)
+        return len(rx) if j < 0 else j + 1
+    if c.isdigit():
+        j = i + 1
+        while j < len(rx) and rx[j].isdigit():
+            j += 1
+        return j
+    return i + 2
+
+def _skip_class(rx: str, i: int) -> int:
+    # end of the [...] set opening at i; a leading "]" or "^]" and escaped "\]" are members, not the close
+    j = i + 1
+    if rx[j:j+1] == "^": j += 1
+    if rx[j:j+1] == "]": j += 1
+    while j < len(rx) and rx[j] != "]":
+        j += 2 if rx[j] == "\\" else 1
+    return j + 1
+
+def _required_literal(rx: str) -> Optional[str]:
+    # longest literal run the regex cannot match without; conservative, None when unsure
+    if "|" in rx:
+        return None
+    runs: List[str] = []; cur: List[str] = []
+    i, depth, n = 0, 0, len(rx)
+    def flush():
+        if cur: runs.append("".join(cur)); cur.clear()
+    while i < n:
+        c = rx[i]; nxt = rx[i+1] if i+1 < n else ""
+        if c == "\\" and nxt:
+            if nxt.isalnum():
+                flush(); i = _skip_escape(rx, i); continue
+            ch, step = nxt, 2
+        elif c == "[":
+            flush(); i = _skip_class(rx, i); continue
+        elif c == "(":
+            depth += 1; flush(); i += 1; continue
+        elif c == ")":
+            depth -= 1; flush(); i += 1; continue
+        elif c == "{":
+            # a {m,n} quantifier (its atom was already left out) or a literal brace: either way, no literal text
+            j = rx.find("}", i)
+            flush(); i = n if j < 0 else j + 1; continue
+        elif c in ".^$*+?}":
+            flush(); i += 1; continue
+        else:
+            ch, step = c, 1
+        follow = rx[i+step] if i+step < n else ""
+        if depth > 0 or follow in ("?", "*", "{"):
+            flush()
+        else:
+            cur.append(ch.lower())
+            if follow == "+": flush()
+        i += step
+    flush()
+    best = max(runs, key=len, default="")
+    return best if len(best) >= 3 else None
+
+def _trie_regex(words: List[str]) -> Optional[re.Pattern]:
+    # one alternation factored as a trie: every literal is matched in a single left-to-right scan
+    trie: dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = None
+    def build(node: dict) -> str:
+        alts = [re.escape(ch) + build(node[ch]) for ch in sorted(k for k in node if k)]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        # greedy optional: the longest literal at an offset wins, shorter ones come from the prefix table
+        return "(?:" + body + ")?" if "" in node else body
+    return re.compile(build(trie)) if trie else None
+
+class _LiteralMatcher:
+    def __init__(self, literals: List[str]):
+        self.literals = sorted(set(l for l in literals if l))
+        self._rx = _trie_regex(self.literals)
+        present = set(self.literals)
+        # literals hidden behind a longer match starting at the same offset
+        self._prefixes = {l: [l[:i] for i in range(1, len(l)) if l[:i] in present] for l in self.literals}
+
+    def findall(self, lowered: str) -> set:
+        found: set = set()
+        if self._rx is None:
+            return found
+        pos = 0; search = self._rx.search
+        while True:
+            m = search(lowered, pos)
+            if m is None:
+                return found
+            hit = m.group(0)
+            if hit not in found:
+                found.add(hit)
+                found.update(self._prefixes.get(hit, ()))
+            pos = m.start() + 1
+
+def _version(tpl: Optional[str], m) -> Optional[str]:
+    if not tpl:
+        return None
+    def grp(i: int) -> str:
+        try: return m.group(i) or ""
+        except (IndexError, re.error): return ""
+    v = _TERNARY_RE.sub(lambda t: t.group(2) if grp(int(t.group(1))) else t.group(3), tpl)
+    v = _GROUP_RE.sub(lambda t: grp(int(t.group(1))), v).strip()
+    return v or None
+
+def _as_list(v) -> list:
+    if v is None: return []
+    return list(v) if isinstance(v, (list, tuple)) else [v]
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (name or "").lower()).strip("-")
+
+def _load_db(path: str) -> dict:
+    if os.path.isdir(path):
+        # Wappalyzer source tree layout: technologies/*.json (+ categories.json)
+        db: dict = {"technologies": {}, "categories": {}}
+        tech_dir = os.path.join(path, "technologies") if os.path.isdir(os.path.join(path, "technologies")) else path
+        for fn in sorted(os.listdir(tech_dir)):
+            if fn.endswith(".json") and fn != "categories.json":
+                with open(os.path.join(tech_dir, fn), "r", encoding="utf-8") as f:
+                    db["technologies"].update(json.load(f))
+        cat_path = os.path.join(path, "categories.json")
+        if os.path.exists(cat_path):
+            with open(cat_path, "r", encoding="utf-8") as f:
+                db["categories"] = json.load(f)
+        return db
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 class Fingerprinter:
     def __init__(self, fingerprints_path: str):
         self.db = {"technologies": []}
         try:
-            with open(fingerprints_path, "r", encoding="utf-8") as f:
-                self.db = json.load(f)
+            self.db = _load_db(fingerprints_path)
         except Exception:
             pass
+        self._compile()
+
+    def _compile(self):
+        techs = self.db.get("technologies") or self.db.get("apps") or []
+        if isinstance(techs, dict):
+            techs = [dict(spec, name=spec.get("name") or name) for name, spec in techs.items()]
+        cats = self.db.get("categories") or {}
+        self.techs: List[dict] = []
+        self._by_name: Dict[str, int] = {}
+        self._implies: Dict[int, List[str]] = {}
+        self._headers: Dict[str, List[_Pattern]] = {}
+        self._cookies: Dict[str, List[_Pattern]] = {}
+        self._meta: Dict[str, List[_Pattern]] = {}
+        self._scripts: List[_Pattern] = []
+        self._inline_scripts: List[_Pattern] = []
+        self._html_literal: Dict[str, List[_Pattern]] = {}
+        self._html_gated: Dict[str, List[_Pattern]] = {}
+        self._html_always: List[_Pattern] = []
+        for t in techs:
+            idx = len(self.techs)
+            categories = t.get("categories") or [(cats.get(str(c)) or {}).get("name", c) for c in _as_list(t.get("cats"))]
+            self.techs.append({"name": t.get("name"), "slug": t.get("slug") or _slug(t.get("name")), "categories": categories})
+            self._by_name[(t.get("name") or "").lower()] = idx
+            self._implies[idx] = [str(i).split(_TAG_SEP)[0] for i in _as_list(t.get("implies"))]
+            for table, key in ((self._headers, "headers"), (self._cookies, "cookies"), (self._meta, "meta")):
+                for name, pats in (t.get(key) or {}).items():
+                    for raw in _as_list(pats):
+                        p = self._pattern(idx, raw)
+                        if p: table.setdefault(name.lower(), []).append(p)
+            # scriptSrc (and the older "script") match <script src> URLs; "scripts" matches inline script content
+            for raw in _as_list(t.get("scriptSrc")) + _as_list(t.get("script")):
+                p = self._pattern(idx, raw)
+                if p: self._scripts.append(p)
+            for raw in _as_list(t.get("scripts")):
+                p = self._pattern(idx, raw)
+                if p: self._inline_scripts.append(p)
+            for raw in _as_list(t.get("html")):
+                p = self._pattern(idx, raw)
+                if p is None:
+                    continue
+                if p.literal is not None and len(p.literal) <= _MAX_LITERAL:
+                    self._html_literal.setdefault(p.literal, []).append(p)
+                elif p.required is not None:
+                    self._html_gated.setdefault(p.required, []).append(p)
+                else:
+                    self._html_always.append(p)
+        self._html_matcher = _LiteralMatcher(list(self._html_literal) + list(self._html_gated))
+
+    @staticmethod
+    def _pattern(idx: int, raw) -> Optional[_Pattern]:
+        try:
+            return _Pattern(idx, raw)
+        except re.error:
+            # JS-only regex syntax, or a legacy plain-text fragment such as "<?php" or "[if IE": match it literally
+            return _Pattern(idx, raw, literal=True) if str(raw).split(_TAG_SEP)[0] else None
 
     def detect(self, headers: Dict[str,str], html: str) -> List[dict]:
+        hits: Dict[int, dict] = {}
+        def hit(p: _Pattern, m, weight: int):
+            h = hits.setdefault(p.tech, {"score": 0, "confidence": 0, "version": None})
+            h["score"] += weight
+            h["confidence"] = min(100, h["confidence"] + p.confidence)
+            h["version"] = h["version"] or _version(p.version, m)
+        hdrs = { (k or '').lower(): (v or '') for k,v in (headers or {}).items() }
+        for name, value in hdrs.items():
+            pats = self._headers.get(name)
+            if pats:
+                low = value.lower()
+                for p in pats:
+                    m = p.search(value, low)
+                    if m: hit(p, m, 2)
+        if self._cookies and "set-cookie" in hdrs:
+            for part in re.split(r",\s*(?=[^;,=\s]+=)", hdrs["set-cookie"]):
+                name, _, rest = part.partition("=")
+                value = rest.split(";", 1)[0]
+                for p in self._cookies.get(name.strip().lower(), ()):
+                    m = p.search(value, value.lower())
+                    if m: hit(p, m, 2)
+        body = html or ""
+        if body:
+            lowered = body.lower()
+            for lit in self._html_matcher.findall(lowered):
+                for p in self._html_literal.get(lit, ()):
+                    hit(p, True, 1)
+                for p in self._html_gated.get(lit, ()):
+                    m = p.regex.search(body)
+                    if m: hit(p, m, 1)
+            # regexes with no usable gate, and literals too long for the shared matcher
+            for p in self._html_always:
+                m = p.search(body, lowered)
+                if m: hit(p, m, 1)
+            if self._meta:
+                for tag in _META_TAG_RE.findall(body):
+                    attrs = {a.lower(): (v1 or v2 or v3) for a, v1, v2, v3 in _ATTR_RE.findall(tag)}
+                    name = (attrs.get("name") or attrs.get("property") or "").lower()
+                    content = attrs.get("content") or ""
+                    for p in self._meta.get(name, ()):
+                        m = p.search(content, content.lower())
+                        if m: hit(p, m, 1)
+            if self._scripts:
+                srcs = "\n".join(_SCRIPT_SRC_RE.findall(body))
+                if srcs:
+                    low = srcs.lower()
+                    for p in self._scripts:
+                        m = p.search(srcs, low)
+                        if m: hit(p, m, 1)
+            if self._inline_scripts:
+                inline = "\n".join(_INLINE_SCRIPT_RE.findall(body))
+                if inline:
+                    low = inline.lower()
+                    for p in self._inline_scripts:
+                        m = p.search(inline, low)
+                        if m: hit(p, m, 1)
+        pending = list(hits)
+        while pending:
+            for name in self._implies.get(pending.pop(), ()):
+                idx = self._by_name.get(name.lower())
+                if idx is not None and idx not in hits:
+                    hits[idx] = {"score": 0, "confidence": 100, "version": None, "implied": True}
+                    pending.append(idx)
         techs = []
-        hdrs = { (k or '').lower(): (v or '').lower() for k,v in (headers or {}).items() }
-        body = (html or "").lower()
-        for t in self.db.get("technologies", []):
-            score = 0; matched = False
-            for hk, hv in (t.get("headers") or {}).items():
-                hv = hv.lower()
-                if hk.lower() in hdrs and hv in hdrs[hk.lower()]:
-                    score += 2; matched = True
-            for frag in (t.get("html") or []):
-                if frag.lower() in body:
-                    score += 1; matched = True
-            if matched:
-                techs.append({
-                    "name": t.get("name"),
-                    "slug": t.get("slug"),
-                    "categories": t.get("categories", []),
-                    "score": score
-                })
+        for idx, h in hits.items():
+            t = dict(self.techs[idx], score=h["score"])
+            if h["version"]: t["version"] = h["version"]
+            if h.get("implied"): t["implied"] = True
+            techs.append(t)
         techs.sort(key=lambda x: (-x["score"], x["name"] or ""))
         return techs
+
+@lru_cache(maxsize=8)
+def load_fingerprinter(fingerprints_path: str) -> Fingerprinter:
+    return Fingerprinter(fingerprints_path)
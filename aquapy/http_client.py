@@ -0,0 +1,44 @@
+from __future__ import annotations
+import httpx
+from typing import Dict, Optional
+from .tlsinfo import CertCache
+from .dns import DNSCache, ResolvingBackend
+
+class ClientManager:
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20, http2: bool = False, verify: bool = True, dns: Optional[DNSCache] = None):
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                raise SystemExit("-http2 requires the 'h2' package (pip install 'httpx[http2]')")
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.http2 = http2
+        # one SSL context shared by every pooled client; httpx uses it as is, so it must carry the h2 ALPN offer itself
+        self.ssl_context = httpx.create_ssl_context(verify=verify, http2=http2)
+        self._clients: Dict[Optional[str], httpx.AsyncClient] = {}
+        self.dns = dns
+        self.certs = CertCache(dns=dns)
+
+    def get(self, proxy: Optional[str] = None) -> httpx.AsyncClient:
+        client = self._clients.get(proxy)
+        if client is None:
+            transport = httpx.AsyncHTTPTransport(retries=0, verify=self.ssl_context, limits=self.limits, http2=self.http2, proxy=proxy)
+            pool = getattr(transport, "_pool", None)
+            if self.dns is not None and proxy is None and hasattr(pool, "_network_backend"):
+                # httpx has no resolver hook; swap httpcore's network backend for one backed by the run's DNS cache
+                pool._network_backend = ResolvingBackend(pool._network_backend, self.dns)
+            client = httpx.AsyncClient(verify=self.ssl_context, transport=transport, limits=self.limits, http2=self.http2)
+            self._clients[proxy] = client
+        return client
+
+    async def aclose(self):
+        clients, self._clients = list(self._clients.values()), {}
+        for c in clients:
+            try: await c.aclose()
+            except Exception: pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
@@ -0,0 +1,62 @@
+from __future__ import annotations
+import io, os
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from PIL import Image
+import imagehash
+
+# Everything here runs inside the image worker processes (or the default thread pool): keep it picklable and loop-free.
+
+SCREENSHOT_FORMATS = {"png": ("PNG", ".png"), "jpeg": ("JPEG", ".jpg"), "webp": ("WEBP", ".webp")}
+THUMBS_DIR = "thumbs"
+
+def screenshot_ext(fmt: str) -> str:
+    return SCREENSHOT_FORMATS[fmt][1]
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    pil_fmt = SCREENSHOT_FORMATS[fmt][0]
+    if pil_fmt != "PNG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    if pil_fmt == "PNG":
+        img.save(buf, "PNG")
+    elif pil_fmt == "WEBP":
+        img.save(buf, "WEBP", quality=quality, method=4)
+    else:
+        img.save(buf, "JPEG", quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+def _write(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def process_screenshot(png: bytes, out_path: str, fmt: str = "png", quality: int = 80, thumb_width: int = 0) -> dict:
+    # one decode serves the pHash, the re-encode and the grid thumbnail; thumbs go to <dir>/thumbs/ next to out_path
+    ph = None; thumb_path = None
+    try:
+        img = Image.open(io.BytesIO(png)); img.load()
+    except Exception:
+        _write(out_path, png)
+        return {"path": out_path, "phash": None, "thumb_path": None}
+    with img:
+        try:
+            ph = str(imagehash.phash(img))
+        except Exception:
+            pass
+        _write(out_path, png if fmt == "png" else _encode(img, fmt, quality))
+        if thumb_width > 0 and img.width > thumb_width:
+            thumb = img.resize((thumb_width, max(1, round(img.height * thumb_width / img.width))), Image.LANCZOS)
+            # png captures get jpeg thumbs: a lossless grid thumbnail would cost most of what it saves
+            thumb_fmt = "jpeg" if fmt == "png" else fmt
+            base = os.path.splitext(os.path.basename(out_path))[0]
+            thumb_path = os.path.join(os.path.dirname(out_path), THUMBS_DIR, base + screenshot_ext(thumb_fmt))
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            _write(thumb_path, _encode(thumb, thumb_fmt, quality))
+    return {"path": out_path, "phash": ph, "thumb_path": thumb_path}
+
+def make_executor(workers: int) -> Optional[ProcessPoolExecutor]:
+    if workers <= 0:
+        return None
+    # spawn: never fork a process that already runs the event loop and the Playwright driver
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
@@ -0,0 +1,56 @@
+from __future__ import annotations
+import argparse, os, sys
+from pathlib import Path
+from typing import List, Optional
+from .artifacts import relocate_artifact
+from .cluster import assign_clusters
+from .models import Entry
+from .report import render_report, write_urls
+from .session import SessionStore, find_session, iter_session
+from .targets import SeenSet
+
+def merge_sessions(sources: List[str], out_dir: str, link: bool = True) -> List[Entry]:
+    """Combine shard outputs into out_dir: entries (first shard wins on duplicate
+    target URLs) and their headers/body/screenshot/thumbnail files."""
+    os.makedirs(out_dir, exist_ok=True)
+    seen = SeenSet(); entries: List[Entry] = []
+    for src in sources:
+        path = find_session(src)
+        src = os.path.dirname(os.path.abspath(path))
+        for e in iter_session(path):
+            if not seen.add(e.preflight.url):
+                continue
+            p = e.preflight
+            p.headers_path = relocate_artifact(p.headers_path, src, out_dir, link)
+            p.body_path = relocate_artifact(p.body_path, src, out_dir, link)
+            if e.shot:
+                e.shot.path = relocate_artifact(e.shot.path, src, out_dir, link)
+                e.shot.thumb_path = relocate_artifact(e.shot.thumb_path, src, out_dir, link)
+                e.shot.cluster_id = None
+            entries.append(e)
+    return entries
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(prog="aquapy merge", description="Merge sharded aquapy outputs into one session and report")
+    ap.add_argument("sources", nargs="+", help="Output directories of the shards (each with aquatone_session.jsonl)")
+    ap.add_argument("-out", required=True, help="Directory to write the merged session, artifacts and report to")
+    ap.add_argument("-copy", action="store_true", help="Copy artifacts instead of hard-linking them")
+    ap.add_argument("-phash-threshold", type=int, default=10, help="Hamming distance for clustering pHash (default 10)")
+    ap.add_argument("-template-path", help="Path to HTML template to use for report")
+    ap.add_argument("-report-mode", dest="report_mode", choices=["auto","full","sharded"], default="auto", help="Report layout, as for a scan (default auto)")
+    ap.add_argument("-report-shard-size", dest="report_shard_size", type=int, default=500, help="Cards per data shard in sharded reports (default 500)")
+    ap.add_argument("-silent", action="store_true", help="Suppress all output except errors")
+    args = ap.parse_args(argv)
+
+    out_dir = os.path.expanduser(args.out)
+    entries = merge_sessions(args.sources, out_dir, link=not args.copy)
+    # pHash clusters are only meaningful across the whole scope, so they are recomputed here
+    assign_clusters(entries, args.phash_threshold)
+    with SessionStore(out_dir).open() as store:
+        for e in entries:
+            store.append(e)
+    write_urls(entries, out_dir)
+    report_path = render_report(entries, out_dir, args.template_path or str(Path(__file__).with_name("templates")), mode=args.report_mode, shard_size=args.report_shard_size)
+    if not args.silent:
+        print(f"merged {len(entries)} entries from {len(args.sources)} shards", file=sys.stderr)
+        print(report_path)
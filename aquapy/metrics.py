@@ -0,0 +1,160 @@
+from __future__ import annotations
+import json, os, time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+from .models import Entry
+
+# per-target phase timings (ms) travel with the results (PreflightResult.timings / ShotResult.timings);
+# Metrics aggregates them run-wide for the progress line and the metrics file
+
+PHASES = ("dns", "connect", "tls", "http", "body", "fingerprint", "probe", "goto", "networkidle", "screenshot", "image", "shot")
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+current_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("aquapy_timings", default=None)
+
+def record(phase: str, seconds: float, timings: Optional[Dict[str, float]] = None):
+    t = timings if timings is not None else current_timings.get()
+    if t is not None:
+        t[phase] = round(t.get(phase, 0.0) + seconds * 1000, 2)
+
+@contextmanager
+def timed(phase: str, timings: Optional[Dict[str, float]] = None):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - t0, timings)
+
+def http_trace(timings: Dict[str, float]):
+    # httpcore "trace" request extension: connect/TLS come from connection events, http is request start -> response headers
+    started: Dict[str, float] = {}
+    phases = {"connection.connect_tcp": "connect", "connection.start_tls": "tls"}
+    async def trace(name: str, info: dict):
+        event, _, edge = name.rpartition(".")
+        if event.endswith("send_request_headers"):
+            event = "request"
+        elif event.endswith("receive_response_headers"):
+            if edge == "complete" and "request" in started:
+                record("http", time.perf_counter() - started.pop("request"), timings)
+            return
+        if edge == "started":
+            started[event] = time.perf_counter()
+        elif edge in ("complete", "failed") and event in phases and event in started:
+            record(phases[event], time.perf_counter() - started.pop(event), timings)
+    return trace
+
+class Histogram:
+    __slots__ = ("count", "sum", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def observe(self, ms: float):
+        self.count += 1
+        self.sum += ms
+        self.max = max(self.max, ms)
+        for i, b in enumerate(BUCKETS_MS):
+            if ms <= b:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def quantile(self, q: float) -> float:
+        # bucket upper bound: coarse, but constant memory for millions of targets; never above the largest sample
+        want = q * self.count; seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= want and n:
+                return min(float(BUCKETS_MS[i]), self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+class Metrics:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.entries = 0
+        self.ok = 0
+        self.shots_ok = 0
+        self.phases: Dict[str, Histogram] = {}
+        self.errors: Counter = Counter()
+        self.gauges: Dict[str, Callable[[], float]] = {}
+
+    def observe(self, phase: str, ms: float):
+        h = self.phases.get(phase)
+        if h is None:
+            h = self.phases[phase] = Histogram()
+        h.observe(ms)
+
+    def observe_entry(self, e: Entry):
+        self.entries += 1
+        pre = e.preflight
+        if pre.ok:
+            self.ok += 1
+        else:
+            self.errors[pre.error_kind or "other"] += 1
+        for phase, ms in (pre.timings or {}).items():
+            self.observe(phase, ms)
+        if e.shot:
+            if e.shot.error: self.errors["screenshot"] += 1
+            else: self.shots_ok += 1
+            for phase, ms in (e.shot.timings or {}).items():
+                self.observe(phase, ms)
+
+    def snapshot(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        gauges = {}
+        for name, fn in self.gauges.items():
+            try: gauges[name] = fn()
+            except Exception: pass
+        return {
+            "elapsed_s": round(elapsed, 1), "entries": self.entries, "ok": self.ok, "shots_ok": self.shots_ok,
+            "entries_per_s": round(self.entries / elapsed, 2) if elapsed > 0 else 0.0,
+            "errors": dict(self.errors), "gauges": gauges,
+            "phases_ms": {p: {"count": h.count, "avg": round(h.sum / h.count, 1) if h.count else 0.0, "p50": h.quantile(0.5), "p99": h.quantile(0.99), "max": round(h.max, 1)}
+                          for p, h in sorted(self.phases.items(), key=lambda kv: PHASES.index(kv[0]) if kv[0] in PHASES else len(PHASES))},
+        }
+
+    def progress_line(self) -> str:
+        s = self.snapshot()
+        parts = [f"[{s['elapsed_s']:.0f}s] {s['entries']} done ({s['ok']} ok, {s['shots_ok']} shots) {s['entries_per_s']:.1f}/s"]
+        if s["gauges"]:
+            parts.append(" ".join(f"{k}={v:g}" for k, v in s["gauges"].items()))
+        if s["errors"]:
+            parts.append("err " + " ".join(f"{k}={v}" for k, v in sorted(s["errors"].items())))
+        slow = [f"{p}={v['p50']:g}" for p, v in s["phases_ms"].items() if p in ("http", "goto", "networkidle", "screenshot")]
+        if slow:
+            parts.append("p50ms " + " ".join(slow))
+        return " | ".join(parts)
+
+    def to_prometheus(self) -> str:
+        s = self.snapshot()
+        out = ["# TYPE aquapy_entries_total counter", f"aquapy_entries_total {s['entries']}",
+               "# TYPE aquapy_entries_ok_total counter", f"aquapy_entries_ok_total {s['ok']}",
+               "# TYPE aquapy_screenshots_ok_total counter", f"aquapy_screenshots_ok_total {s['shots_ok']}",
+               "# TYPE aquapy_elapsed_seconds gauge", f"aquapy_elapsed_seconds {s['elapsed_s']}",
+               "# TYPE aquapy_errors_total counter"]
+        out += [f'aquapy_errors_total{{kind="{k}"}} {v}' for k, v in sorted(s["errors"].items())]
+        out.append("# TYPE aquapy_gauge gauge")
+        out += [f'aquapy_gauge{{name="{k}"}} {v}' for k, v in s["gauges"].items()]
+        out.append("# TYPE aquapy_phase_ms histogram")
+        for p, h in self.phases.items():
+            cum = 0
+            for b, n in zip(BUCKETS_MS, h.buckets):
+                cum += n
+                out.append(f'aquapy_phase_ms_bucket{{phase="{p}",le="{b}"}} {cum}')
+            out.append(f'aquapy_phase_ms_bucket{{phase="{p}",le="+Inf"}} {h.count}')
+            out.append(f'aquapy_phase_ms_sum{{phase="{p}"}} {round(h.sum, 2)}')
+            out.append(f'aquapy_phase_ms_count{{phase="{p}"}} {h.count}')
+        return "\n".join(out) + "\n"
+
+    def write(self, path: str):
+        # .json -> JSON snapshot, anything else -> Prometheus text format; replaced atomically for scrapers
+        data = json.dumps(self.snapshot(), indent=2) if path.endswith(".json") else self.to_prometheus()
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
@@ -21,6 +21,13 @@ class PreflightResult:
     body_path: Optional[str] = None
     headers_path: Optional[str] = None
     technologies: List[dict] = field(default_factory=list)
+    tls: Optional[dict] = None
+    body_size: Optional[int] = None
+    body_truncated: bool = False
+    error_kind: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    body_sha256: Optional[str] = None
+    revalidated: bool = False
 
 @dataclass
 class ShotResult:
@@ -31,6 +38,10 @@ class ShotResult:
     phash: Optional[str] = None
     error: Optional[str] = None
     cluster_id: Optional[int] = None
+    thumb_path: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    reused: bool = False
+    alias_of: Optional[str] = None
 
 @dataclass
 class Entry:
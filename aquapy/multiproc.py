@@ -0,0 +1,114 @@
+from __future__ import annotations
+import asyncio, dataclasses, itertools, multiprocessing, queue, sys, threading, time
+from typing import Callable, Dict, Iterator, Optional, Set
+from .config import Settings
+from .models import Entry, Target
+from .pipeline import Pipeline, StageStats
+from .targets import target_hostname
+from .session import entry_from_dict, entry_to_dict
+from .fingerprints import load_fingerprinter
+from .metrics import Metrics
+from .baseline import Baseline
+
+# -workers N: one coordinator (this process) and N spawned workers, each running a full Pipeline
+# (own event loop, HTTP clients, DNS cache, browser pool). Targets travel as per-host groups, results as Entry dicts.
+
+def _iter_tasks(tasks) -> Iterator[Target]:
+    while True:
+        group = tasks.get()
+        if group is None:
+            return
+        yield from group
+
+async def _worker(wid: int, settings: Settings, out_dir: str, fingerprints_path: Optional[str], baseline: Optional[Baseline], tasks, results):
+    def on_entry(e: Entry):
+        results.put(("entry", wid, entry_to_dict(e)))
+    fingerprinter = load_fingerprinter(fingerprints_path) if fingerprints_path else None
+    async with Pipeline(settings, out_dir, fingerprinter=fingerprinter, baseline=baseline) as pipeline:
+        await pipeline.run(_iter_tasks(tasks), on_entry)
+    results.put(("done", wid, {name: (st.done, st.ok, st.retried) for name, st in pipeline.stats.items()}))
+
+def _worker_main(wid: int, settings: Settings, out_dir: str, fingerprints_path: Optional[str], baseline: Optional[Baseline], tasks, results):
+    try:
+        asyncio.run(_worker(wid, settings, out_dir, fingerprints_path, baseline, tasks, results))
+    except KeyboardInterrupt:
+        pass
+
+def _feed(targets: Iterator[Target], tasks, workers: int, stop: threading.Event):
+    # whole hosts go to one worker, so -per-host and the DNS cache keep their meaning; the shared queue balances load
+    def put(item):
+        while not stop.is_set():
+            try:
+                tasks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    for _, group in itertools.groupby(targets, key=target_hostname):
+        if not put(list(group)):
+            return
+    for _ in range(workers):
+        if not put(None):
+            return
+
+def _qsize(q) -> int:
+    try:
+        return q.qsize()
+    except NotImplementedError:  # macOS
+        return -1
+
+def run_workers(workers: int, settings: Settings, out_dir: str, fingerprints_path: Optional[str], targets: Iterator[Target], on_entry: Callable[[Entry], None], baseline: Optional[Baseline] = None) -> Dict[str, StageStats]:
+    ctx = multiprocessing.get_context("spawn")
+    tasks = ctx.Queue(maxsize=workers * 16)
+    results = ctx.Queue()
+    # progress and the metrics file are the coordinator's job: it sees every entry
+    worker_settings = dataclasses.replace(settings, progress_interval=0, metrics_file=None)
+    metrics = Metrics()
+    # not daemonic: workers start their own image process pools and Chromium; each gets its own copy of the baseline
+    procs = [ctx.Process(target=_worker_main, args=(i, worker_settings, out_dir, fingerprints_path, baseline, tasks, results), name=f"aquapy-worker-{i}") for i in range(workers)]
+    for p in procs:
+        p.start()
+    stop = threading.Event()
+    feeder = threading.Thread(target=_feed, args=(targets, tasks, workers, stop), name="aquapy-feed", daemon=True)
+    feeder.start()
+    stats = {name: StageStats(name) for name in ("scan", "probe", "screenshot")}
+    finished: Set[int] = set()
+    metrics.gauges.update({"workers_alive": lambda: sum(p.is_alive() for p in procs), "task_q": lambda: _qsize(tasks)})
+    next_report = time.monotonic() + (settings.progress_interval or 10)
+    try:
+        while len(finished) < workers:
+            if time.monotonic() >= next_report:
+                next_report = time.monotonic() + (settings.progress_interval or 10)
+                if settings.progress_interval > 0 and not settings.silent:
+                    print(metrics.progress_line(), file=sys.stderr, flush=True)
+                if settings.metrics_file:
+                    metrics.write(settings.metrics_file)
+            try:
+                kind, wid, payload = results.get(timeout=0.5)
+            except queue.Empty:
+                crashed = [i for i, p in enumerate(procs) if i not in finished and not p.is_alive() and p.exitcode != 0]
+                for i in crashed:
+                    print(f"worker {i} exited with code {procs[i].exitcode}; its in-flight targets are lost", file=sys.stderr)
+                    finished.add(i)
+                continue
+            if kind == "entry":
+                e = entry_from_dict(payload)
+                metrics.observe_entry(e)
+                on_entry(e)
+            elif kind == "done":
+                finished.add(wid)
+                for name, (done, ok, retried) in payload.items():
+                    st = stats.setdefault(name, StageStats(name))
+                    st.done += done; st.ok += ok; st.retried += retried
+    finally:
+        stop.set()
+        if settings.metrics_file:
+            metrics.write(settings.metrics_file)
+        for p in procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+    now = time.monotonic()
+    for st in stats.values():
+        st.finished = now
+    return stats
@@ -1,32 +1,153 @@
 from __future__ import annotations
-import os
+import io, itertools, json, os, sys
 import xml.etree.ElementTree as ET
-from typing import List, Dict
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-def _parse_root(source: str):
-    if os.path.exists(source):
-        tree = ET.parse(source)
-        return tree.getroot()
-    return ET.fromstring(source)
+# streaming readers for port-scanner output: (host, port) pairs are yielded as they are parsed,
+# so multi-GB masscan files never sit in memory. Formats: Nmap/Masscan XML (-oX), masscan JSON (-oJ/-oD)
+# and masscan list (-oL).
+
+def sniff(line: str) -> Optional[str]:
+    s = line.lstrip("\ufeff \t")
+    if s.startswith("<"):
+        return "xml"
+    if s.startswith(("[", "{")):
+        return "json"
+    if s.startswith("#masscan") or s.split(" ", 1)[0] in ("open", "closed"):
+        return "list"
+    return None
+
+class _LineReader:
+    # file-like read() over an iterator of text lines, for iterparse on stdin
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+
+    def read(self, size: int = -1) -> str:
+        for line in self._lines:
+            if line:
+                return line + "\n"
+        return ""
+
+def _iter_xml(source: Union[str, IO], name: str) -> Iterator[Tuple[str, int]]:
+    root = None
+    try:
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag != "host":
+                continue
+            host = next((h.get("name") for h in elem.iter("hostname") if h.get("name")), None) \
+                or next((a.get("addr") for a in elem.iterfind("address") if a.get("addr")), None)
+            ports = []
+            for p in elem.iter("port"):
+                state = p.find("state")
+                if state is not None and state.get("state") == "open":
+                    try: ports.append(int(p.get("portid")))
+                    except Exception: pass
+            # finished hosts are dropped from the tree: memory stays flat whatever the file size
+            root.clear()
+            if host:
+                for port in sorted(set(ports)):
+                    yield host, port
+    except ET.ParseError as e:
+        # masscan killed mid-run leaves the document unterminated; everything before the break is kept
+        print(f"{name}: XML ends early ({e}); using the hosts parsed so far", file=sys.stderr)
+
+def _json_ports(obj) -> Iterator[Tuple[str, int]]:
+    if not isinstance(obj, dict):
+        return
+    host = obj.get("ip") or obj.get("host")
+    if not host:
+        return
+    for p in obj.get("ports") or ():
+        # banner records carry no status but only exist for open ports
+        if isinstance(p, dict) and p.get("status", "open") == "open":
+            try: yield host, int(p["port"])
+            except Exception: pass
+
+def _iter_json(lines: Iterable[str]) -> Iterator[Tuple[str, int]]:
+    # masscan writes one record per line inside "[ ... ]", with stray commas depending on the version;
+    # -oD is the same without the brackets. Records spanning several lines (pretty-printed) are buffered until they parse.
+    buf = ""
+    for line in lines:
+        s = line.strip()
+        if not buf:
+            s = s.strip(",")
+            if s in ("", "[", "]"):
+                continue
+            if s.startswith("[") and s.endswith("]"):
+                try:
+                    for obj in json.loads(s):
+                        yield from _json_ports(obj)
+                    continue
+                except ValueError:
+                    pass
+            s = s.lstrip("[")
+        buf += s
+        # a record is an object, so trailing "," / "]" from the surrounding array can go
+        try:
+            obj = json.loads(buf.rstrip(",] \t"))
+        except ValueError:
+            if len(buf) > 1 << 20:
+                buf = ""  # not a record after 1 MiB: resync on the next line
+            continue
+        buf = ""
+        yield from _json_ports(obj)
+
+def _iter_list(lines: Iterable[str]) -> Iterator[Tuple[str, int]]:
+    # "open tcp 80 10.0.0.1 1600000000"
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 4 and parts[0] == "open":
+            try: yield parts[3], int(parts[2])
+            except ValueError: pass
+
+def iter_open_ports_lines(lines: Iterable[str], name: str = "<stdin>") -> Iterator[Tuple[str, int]]:
+    """(host, port) pairs from scanner output given as text lines, e.g. piped on stdin."""
+    lines = iter(lines)
+    for first in lines:
+        if first.strip():
+            break
+    else:
+        return
+    lines = itertools.chain([first], lines)
+    kind = sniff(first)
+    if kind == "xml":
+        yield from _iter_xml(_LineReader(lines), name)
+    elif kind == "json":
+        yield from _iter_json(lines)
+    elif kind == "list":
+        yield from _iter_list(lines)
+    else:
+        raise SystemExit(f"{name}: not Nmap/Masscan XML, masscan JSON or masscan list output")
+
+def iter_open_ports(path: str) -> Iterator[Tuple[str, int]]:
+    """(host, port) pairs from a scanner output file; the format is detected from its first bytes."""
+    with open(path, "rb") as f:
+        head = f.read(256).lstrip()
+        f.seek(0)
+        kind = sniff(head.decode("utf-8", errors="replace"))
+        if kind == "xml":
+            yield from _iter_xml(f, path)
+            return
+        text = io.TextIOWrapper(f, encoding="utf-8", errors="replace")
+        if kind == "json":
+            yield from _iter_json(text)
+        elif kind == "list":
+            yield from _iter_list(text)
+        else:
+            raise SystemExit(f"{path}: not Nmap/Masscan XML, masscan JSON or masscan list output")
 
 def parse_open_ports(source: str) -> Dict[str, List[int]]:
+    # whole-document form (a path or the output itself), for callers that want a dict
     res: Dict[str, List[int]] = {}
-    root = _parse_root(source)
-    for host in root.findall(".//host"):
-        addresses = [a.get("addr") for a in host.findall("address") if a.get("addr")]
-        hostnames = [h.get("name") for h in host.findall(".//hostname") if h.get("name")]
-        name = hostnames[0] if hostnames else (addresses[0] if addresses else None)
-        if not name:
-            continue
-        ports = []
-        for p in host.findall(".//port"):
-            state = p.find("state")
-            if state is not None and state.get("state") == "open":
-                try: ports.append(int(p.get("portid")))
-                except Exception: pass
-        if ports:
-            res.setdefault(name, [])
-            for prt in sorted(set(ports)):
-                if prt not in res[name]:
-                    res[name].append(prt)
+    pairs = iter_open_ports(source) if os.path.exists(source) else iter_open_ports_lines(source.splitlines())
+    for host, port in pairs:
+        res.setdefault(host, [])
+        if port not in res[host]:
+            res[host].append(port)
+    for ports in res.values():
+        ports.sort()
     return res
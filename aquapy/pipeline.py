@@ -0,0 +1,238 @@
+from __future__ import annotations
+import asyncio, concurrent.futures, itertools, os, sys, threading, time
+from typing import Callable, Dict, Iterator, Optional
+from .config import Settings
+from .models import Entry, PreflightResult, Target
+from .probe import probe_target
+from .screenshot import screenshot_page
+from .browser_pool import BrowserPool
+from .http_client import ClientManager
+from .imaging import make_executor, screenshot_ext
+from .fingerprints import Fingerprinter
+from .portscan import PortScanner
+from .targets import target_hostname
+from .dns import DNSCache
+from .artifacts import ArtifactSink
+from .scheduler import HostScheduler
+from .metrics import Metrics
+from .baseline import Baseline
+from .dedup import ShotDedup
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.done = 0
+        self.ok = 0
+        self.in_flight = 0
+        self.retried = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    def begin(self):
+        self.in_flight += 1
+
+    def retry(self):
+        self.in_flight -= 1
+        self.retried += 1
+
+    def end(self, ok: bool):
+        self.in_flight -= 1
+        self.done += 1
+        if ok: self.ok += 1
+        self.finished = time.monotonic()
+
+    def rate(self) -> float:
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        elapsed = (self.finished or time.monotonic()) - self.started
+        retried = f", {self.retried} retried" if self.retried else ""
+        return f"{self.name}: {self.done} done ({self.ok} ok{retried}) in {elapsed:.1f}s, {self.rate():.1f}/s"
+
+class Pipeline:
+    def __init__(self, settings: Settings, out_dir: str, fingerprinter: Optional[Fingerprinter] = None, baseline: Optional[Baseline] = None):
+        self.settings = settings
+        self.out_dir = out_dir
+        self.baseline = baseline
+        self.shots_dir = os.path.join(out_dir, "screenshots"); os.makedirs(self.shots_dir, exist_ok=True)
+        self.fingerprinter = fingerprinter
+        self.dns = DNSCache(ttl=settings.dns_ttl, concurrency=settings.dns_concurrency)
+        self.clients = ClientManager(max_connections=settings.max_connections, max_keepalive=settings.max_keepalive, http2=settings.http2, dns=self.dns)
+        self.pool = BrowserPool(browsers=settings.browsers, pages_per_browser=settings.pages_per_browser, recycle_after=settings.browser_recycle, chrome_path=settings.chrome_path, resolver_rules=None if settings.proxy else self.dns.host_resolver_rules)
+        self.images = make_executor(settings.image_workers)
+        self.sink = ArtifactSink(out_dir, workers=settings.io_workers, max_pending=settings.io_workers * 64, fsync_batch=settings.fsync_batch, compression=settings.body_compression)
+        self.scanner = PortScanner(timeout_ms=settings.scan_timeout_ms, concurrency=settings.scan_concurrency, dns=self.dns) if settings.port_scan else None
+        self.stats: Dict[str, StageStats] = {}
+        self.scheduler: Optional[HostScheduler] = None
+        self.dedup: Optional[ShotDedup] = None
+        self.metrics = Metrics()
+
+    async def aclose(self):
+        await self.sink.aclose()
+        await self.clients.aclose()
+        await self.pool.close()
+        if self.images: self.images.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _feed(self, targets: Iterator[Target], q: asyncio.Queue, workers: int):
+        # input is read off the loop by one thread; q is bounded, so the thread waits for the scanners.
+        # expand_targets_line emits every port of a host back to back: group them so each host is handled once.
+        # Each group is queued as soon as it is complete, so piped input (subfinder | aquapy) is probed while it streams
+        loop = asyncio.get_running_loop()
+        stop = threading.Event()
+        def read():
+            for host, ts in itertools.groupby(targets, key=target_hostname):
+                fut = asyncio.run_coroutine_threadsafe(q.put((host, list(ts))), loop)
+                while True:
+                    try:
+                        fut.result(timeout=0.5)
+                        break
+                    except concurrent.futures.TimeoutError:
+                        if stop.is_set():
+                            fut.cancel()
+                            return
+                    except concurrent.futures.CancelledError:
+                        return
+        try:
+            await asyncio.to_thread(read)
+        finally:
+            # the run failed or was cancelled: the reader gives up instead of waiting on a queue nobody drains
+            stop.set()
+        for _ in range(workers):
+            await q.put(None)
+
+    async def _scan_worker(self, q: asyncio.Queue, probes: HostScheduler, on_entry: Callable[[Entry], None]):
+        st = self.stats["scan"]
+        while True:
+            item = await q.get()
+            if item is None:
+                break
+            host, targets = item
+            if self.scanner is not None:
+                st.begin()
+                open_targets = await self.scanner.scan(host, targets)
+                st.end(bool(open_targets))
+                if open_targets is None:
+                    # unresolvable: recorded like the probe would record it, not dropped like a closed port
+                    for t in targets:
+                        on_entry(Entry(preflight=PreflightResult(url=t.url, ok=False, reason=f"[dns] name or service not known: {host}", error_kind="dns")))
+                    continue
+            else:
+                open_targets = targets
+            for t in open_targets:
+                await probes.put(t)
+
+    async def _probe_worker(self, sched: HostScheduler, shots: asyncio.Queue, on_entry: Callable[[Entry], None]):
+        s = self.settings; st = self.stats["probe"]; base = self.baseline
+        while True:
+            target = await sched.get()
+            if target is None:
+                break
+            st.begin()
+            validators = base.validators(target.url) if base else None
+            pre = await probe_target(target, timeout_ms=s.http_timeout_ms, save_body=s.save_body, out_dir=self.out_dir, debug=s.debug, proxy=s.proxy, retries_http=s.retries_http, follow_redirects=s.follow_redirects, clients=self.clients, fingerprinter=self.fingerprinter, sink=self.sink, max_body_size=s.max_body_size, extra_headers=validators)
+            if await sched.done(target, pre):
+                st.retry()
+                continue
+            st.end(pre.ok)
+            if not pre.ok:
+                on_entry(Entry(preflight=pre))
+                continue
+            if base is not None:
+                # incremental rescan: a 304 keeps the stored preflight, an unchanged page keeps its old screenshot
+                if pre.status == 304 and validators:
+                    pre = await asyncio.to_thread(base.revalidated, pre, self.out_dir)
+                shot = await asyncio.to_thread(base.reuse_shot, pre, self.out_dir)
+                if shot is not None:
+                    on_entry(Entry(preflight=pre, shot=shot))
+                    continue
+            if self.dedup is None or self.dedup.offer(pre):
+                await shots.put((target, pre))
+
+    async def _shot_worker(self, q: asyncio.Queue, on_entry: Callable[[Entry], None]):
+        s = self.settings; st = self.stats["screenshot"]
+        while True:
+            item = await q.get()
+            if item is None:
+                break
+            _, pre = item
+            # a failed render hands its dedup group to the next waiting endpoint, shot here rather than requeued
+            while pre is not None:
+                url = pre.final_url or pre.url
+                # named after the target, not the final URL: endpoints redirecting to one URL with different content must not collide
+                path = os.path.join(self.shots_dir, pre.url.replace("://","_").replace("/","_") + screenshot_ext(s.screenshot_format))
+                st.begin()
+                shot = await screenshot_page(self.pool, url, path, s.resolution[0], s.resolution[1], s.user_agent, timeout_ms=s.screenshot_timeout_ms, proxy=s.proxy, full_page=s.full_page, profile=s.profile, retries=s.retries_shot, executor=self.images, fmt=s.screenshot_format, quality=s.screenshot_quality, thumb_width=s.thumb_width)
+                st.end(shot.error is None)
+                on_entry(Entry(preflight=pre, shot=shot))
+                pre = self.dedup.resolve(pre, shot) if self.dedup is not None else None
+
+    async def _report(self, interval: float):
+        # progress line on stderr and/or the metrics file, every `interval` seconds
+        s = self.settings
+        while True:
+            await asyncio.sleep(interval)
+            if s.progress_interval > 0 and not s.silent:
+                print(self.metrics.progress_line(), file=sys.stderr, flush=True)
+            if s.metrics_file:
+                await asyncio.to_thread(self.metrics.write, s.metrics_file)
+
+    async def run(self, targets: Iterator[Target], on_entry: Callable[[Entry], None]):
+        s = self.settings
+        metrics = self.metrics
+        def emit(e: Entry):
+            metrics.observe_entry(e)
+            on_entry(e)
+        scan_n = max(1, s.scan_concurrency // 8) if self.scanner is not None else 1
+        probe_n = max(1, s.probe_concurrency or s.concurrency)
+        shot_n = max(1, s.screenshot_concurrency or self.pool.capacity)
+        scan_q: asyncio.Queue = asyncio.Queue(maxsize=scan_n * 2)
+        # probes go through the per-host scheduler: round-robin across hosts, -per-host cap, -rate, backoff
+        sched = HostScheduler(per_host=s.per_host, rate=s.rate, max_pending=max(probe_n * 4, 4096))
+        self.scheduler = sched
+        shot_q: asyncio.Queue = asyncio.Queue(maxsize=shot_n * 2)
+        self.dedup = ShotDedup(emit) if s.dedup else None
+        self.stats = {"scan": StageStats("scan"), "probe": StageStats("probe"), "screenshot": StageStats("screenshot")}
+        feeder = asyncio.create_task(self._feed(targets, scan_q, scan_n))
+        scanners = [asyncio.create_task(self._scan_worker(scan_q, sched, emit)) for _ in range(scan_n)]
+        probers = [asyncio.create_task(self._probe_worker(sched, shot_q, emit)) for _ in range(probe_n)]
+        shooters = [asyncio.create_task(self._shot_worker(shot_q, emit)) for _ in range(shot_n)]
+        tasks = [feeder, *scanners, *probers, *shooters]
+        metrics.gauges.update({
+            "scan_q": scan_q.qsize, "probe_pending": lambda: sched.pending, "probe_in_flight": lambda: sched.in_flight,
+            "shot_q": shot_q.qsize, "shot_in_flight": lambda: self.stats["screenshot"].in_flight, "host_backoffs": lambda: sched.backoffs,
+        })
+        interval = s.progress_interval if s.progress_interval > 0 else 10
+        reporter = asyncio.create_task(self._report(interval)) if (s.progress_interval > 0 and not s.silent) or s.metrics_file else None
+        async def stage_done(stage):
+            # waits for one stage while watching all of them: a dead shot worker would otherwise leave
+            # the probers blocked on a full shot_q, and the run would never return
+            while not all(t.done() for t in stage):
+                await asyncio.wait([t for t in tasks if not t.done()], return_when=asyncio.FIRST_COMPLETED)
+                for t in tasks:
+                    if t.done() and not t.cancelled() and t.exception() is not None:
+                        raise t.exception()
+        try:
+            await stage_done([feeder])
+            await stage_done(scanners)
+            await sched.close()
+            await stage_done(probers)
+            for _ in range(shot_n):
+                await shot_q.put(None)
+            await stage_done(shooters)
+        except BaseException:
+            for t in tasks: t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+                await asyncio.gather(reporter, return_exceptions=True)
+            if s.metrics_file:
+                metrics.write(s.metrics_file)
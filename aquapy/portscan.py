@@ -0,0 +1,39 @@
+from __future__ import annotations
+import asyncio
+from typing import List, Optional
+from .models import Target
+from .targets import target_port
+from .dns import DNSCache
+
+class PortScanner:
+    def __init__(self, timeout_ms: int = 100, concurrency: int = 512, dns: Optional[DNSCache] = None):
+        self.timeout = timeout_ms / 1000
+        self.dns = dns or DNSCache()
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def resolve(self, host: str) -> List[str]:
+        return await self.dns.resolve(host)
+
+    async def is_open(self, addr: str, port: int) -> bool:
+        async with self._sem:
+            try:
+                transport, _ = await asyncio.wait_for(asyncio.get_running_loop().create_connection(asyncio.Protocol, addr, port), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                return False
+            transport.abort()
+            return True
+
+    async def scan(self, host: str, targets: List[Target]) -> Optional[List[Target]]:
+        # one lookup per host, then every port of that host in parallel; None when the host does not resolve
+        addrs = await self.resolve(host)
+        if not addrs:
+            return None
+        ports = sorted({target_port(t) for t in targets})
+        states = dict.fromkeys(ports, False)
+        # a port counts as open on any of the host's addresses; later addresses only see what is still closed
+        for addr in addrs:
+            todo = [p for p in ports if not states[p]]
+            if not todo:
+                break
+            states.update(zip(todo, await asyncio.gather(*(self.is_open(addr, p) for p in todo))))
+        return [t for t in targets if states[target_port(t)]]
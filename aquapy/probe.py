@@ -1,24 +1,19 @@
 from __future__ import annotations
-import asyncio, ssl, os
+import asyncio, contextlib, hashlib, os, time
 import httpx
-from typing import List, Optional
+from typing import Optional, Tuple
 from .models import Target, PreflightResult
 from .utils import extract_title
-from .fingerprints import Fingerprinter
-
-def _url_from_host_port(host: str, port: int) -> str:
-    scheme = "https" if port in (443, 8443, 9443, 12443) else "http"
-    default_port = (scheme == "https" and port == 443) or (scheme == "http" and port == 80)
-    return f"{scheme}://{host}" if default_port else f"{scheme}://{host}:{port}"
-
-def expand_targets_line(line: str, ports: list[int]) -> List[Target]:
-    line = line.strip()
-    if not line: return []
-    if line.startswith("http://") or line.startswith("https://"):
-        return [Target(host=line.split("://",1)[1].split("/",1)[0], url=line)]
-    return [Target(host=line, url=_url_from_host_port(line, p)) for p in ports]
+from .fingerprints import Fingerprinter, load_fingerprinter
+from .http_client import ClientManager
+from .tlsinfo import cert_from_response
+from .artifacts import ArtifactSink
+from .metrics import current_timings, http_trace, record, timed
 
 def _classify_error(e: Exception) -> str:
+    # waiting on our own connection pool (-max-connections below -probe-concurrency) says nothing about the host
+    if isinstance(e, httpx.PoolTimeout): return "pool"
+    if isinstance(e, (httpx.TimeoutException, asyncio.TimeoutError)): return "timeout"
     s = str(e).lower()
     if "timed out" in s or "timeout" in s: return "timeout"
     if "dns" in s or "name or service not known" in s or "getaddrinfo failed" in s: return "dns"
@@ -26,74 +21,125 @@ def _classify_error(e: Exception) -> str:
     if "connection refused" in s or "connect" in s or "reset by peer" in s: return "network"
     return "other"
 
-async def _http_get(url: str, headers: dict, timeout_ms: int, proxy: Optional[str], retries: int, follow_redirects: bool) -> httpx.Response:
+async def _http_get(client: httpx.AsyncClient, url: str, headers: dict, timeout_ms: int, retries: int, follow_redirects: bool, trace=None) -> httpx.Response:
+    # streamed: the caller reads at most max_body_size and must aclose() the response
     last_exc = None
-    transport = httpx.AsyncHTTPTransport(retries=0)
-    async with httpx.AsyncClient(follow_redirects=follow_redirects, timeout=timeout_ms/1000, verify=True, transport=transport, proxies=proxy) as client:
-        for attempt in range(retries+1):
-            try:
-                r = await client.get(url, headers=headers)
-                return r
-            except Exception as e:
-                last_exc = e
-                if attempt < retries:
-                    await asyncio.sleep(0.25 * (attempt+1))
-                else:
-                    raise
+    for attempt in range(retries+1):
+        try:
+            req = client.build_request("GET", url, headers=headers, timeout=timeout_ms/1000, extensions={"trace": trace} if trace else None)
+            r = await client.send(req, stream=True, follow_redirects=follow_redirects)
+            return r
+        except Exception as e:
+            last_exc = e
+            # a failed lookup is cached for the run; retrying only repeats the same answer
+            if attempt < retries and _classify_error(e) != "dns":
+                await asyncio.sleep(0.25 * (attempt+1))
+            else:
+                raise
     raise last_exc
 
-async def probe_target(target: Target, timeout_ms: int, save_body: bool, out_dir: str, debug=False, proxy: Optional[str]=None, retries_http: int = 2, fingerprints_path: Optional[str]=None, follow_redirects: bool = False) -> PreflightResult:
-    headers = {"User-Agent":"aquapy/0.5.0"}
-    tls_issuer = tls_subject = None
+async def _read_capped(r: httpx.Response, limit: int) -> Tuple[bytes, bool]:
+    buf = bytearray()
+    async for chunk in r.aiter_bytes():
+        buf += chunk
+        if limit and len(buf) > limit:
+            return bytes(buf[:limit]), True
+    return bytes(buf), False
+
+async def probe_target(target: Target, timeout_ms: int, save_body: bool, out_dir: str, debug=False, proxy: Optional[str]=None, retries_http: int = 2, fingerprints_path: Optional[str]=None, follow_redirects: bool = False, clients: Optional[ClientManager]=None, fingerprinter: Optional[Fingerprinter]=None, sink: Optional[ArtifactSink]=None, max_body_size: int = 5*1024*1024, extra_headers: Optional[dict]=None) -> PreflightResult:
+    if clients is None or sink is None:
+        # only what is created here is closed here; a caller's clients or sink stay open
+        async with contextlib.AsyncExitStack() as stack:
+            if clients is None:
+                clients = await stack.enter_async_context(ClientManager())
+            if sink is None:
+                sink = await stack.enter_async_context(ArtifactSink(out_dir))
+            return await probe_target(target, timeout_ms, save_body, out_dir, debug=debug, proxy=proxy, retries_http=retries_http, fingerprints_path=fingerprints_path, follow_redirects=follow_redirects, clients=clients, fingerprinter=fingerprinter, sink=sink, max_body_size=max_body_size, extra_headers=extra_headers)
+    timings: dict = {}
+    token = current_timings.set(timings)
+    t0 = time.perf_counter()
+    try:
+        pre = await _probe(target, timeout_ms, save_body, out_dir, proxy, retries_http, fingerprints_path, follow_redirects, clients, fingerprinter, sink, max_body_size, timings, extra_headers)
+    finally:
+        current_timings.reset(token)
+    record("probe", time.perf_counter() - t0, timings)
+    # the trace's connect span includes the cached lookup done inside ResolvingBackend.connect_tcp
+    if "connect" in timings and "dns" in timings:
+        timings["connect"] = round(max(0.0, timings["connect"] - timings["dns"]), 2)
+    pre.timings = timings
+    return pre
+
+async def _probe(target: Target, timeout_ms: int, save_body: bool, out_dir: str, proxy: Optional[str], retries_http: int, fingerprints_path: Optional[str], follow_redirects: bool, clients: ClientManager, fingerprinter: Optional[Fingerprinter], sink: ArtifactSink, max_body_size: int, timings: dict, extra_headers: Optional[dict] = None) -> PreflightResult:
+    headers = {"User-Agent":"aquapy/0.5.0", **(extra_headers or {})}
+    tls_issuer = tls_subject = tls = None
     final_url = None
     body_path = None
     headers_path = None
     try:
-        r = await _http_get(target.url, headers=headers, timeout_ms=timeout_ms, proxy=proxy, retries=retries_http, follow_redirects=follow_redirects)
-        final_url = str(r.url)
-        # TLS peek (best-effort)
-        if final_url.startswith("https://"):
-            try:
-                hostname = r.url.host
-                port = r.url.port or 443
-                ctx = ssl.create_default_context()
-                reader, writer = await asyncio.open_connection(hostname, port, ssl=ctx, server_hostname=hostname)
-                cert = writer.get_extra_info("peercert")
-                if cert:
-                    tls_subject = str(cert.get("subject"))
-                    tls_issuer = str(cert.get("issuer"))
-                writer.close(); await writer.wait_closed()
-            except Exception:
-                pass
-        title = extract_title(r.text or "") if "text/html" in (r.headers.get("content-type","").lower()) else None
-        # Save headers/body
-        os.makedirs(os.path.join(out_dir, "headers"), exist_ok=True)
-        os.makedirs(os.path.join(out_dir, "html"), exist_ok=True)
+        r = await _http_get(clients.get(proxy), target.url, headers=headers, timeout_ms=timeout_ms, retries=retries_http, follow_redirects=follow_redirects, trace=http_trace(timings))
+        try:
+            final_url = str(r.url)
+            # TLS details from the probe's own connection; fall back to one cached handshake per endpoint
+            if final_url.startswith("https://"):
+                host, port = r.url.host, r.url.port or 443
+                tls = cert_from_response(r)
+                if tls:
+                    clients.certs.put(host, port, tls)
+                else:
+                    tls = await clients.certs.get(host, port, timeout_ms=timeout_ms)
+                if tls:
+                    tls_subject, tls_issuer = tls.get("subject"), tls.get("issuer")
+            with timed("body", timings):
+                body, truncated = await _read_capped(r, max_body_size)
+        finally:
+            await r.aclose()
+        if r.status_code == 304 and extra_headers:
+            # conditional request answered "not modified": the caller carries the stored result over, nothing to save
+            return PreflightResult(url=target.url, ok=True, status=304, reason=r.reason_phrase, headers={k:v for k,v in r.headers.items()}, final_url=final_url, tls=tls, tls_issuer=tls_issuer, tls_subject=tls_subject)
+        text = body.decode(r.encoding or "utf-8", errors="replace")
+        title = extract_title(text) if "text/html" in (r.headers.get("content-type","").lower()) else None
+        # Save headers/body (write-behind, off the event loop)
         safe = (final_url or target.url).replace("://","_").replace("/","_")
         headers_path = os.path.join(out_dir, "headers", f"{safe}.txt")
-        with open(headers_path, "w", encoding="utf-8") as hf:
-            for k,v in r.headers.items():
-                hf.write(f"{k}: {v}\n")
+        await sink.write_text(headers_path, "".join(f"{k}: {v}\n" for k,v in r.headers.items()))
         if save_body:
-            body_path = os.path.join(out_dir, "html", f"{safe}.html")
-            try:
-                with open(body_path, "wb") as bf:
-                    bf.write(r.content)
-            except Exception:
-                body_path = None
+            body_path = sink.body_path(os.path.join(out_dir, "html", f"{safe}.html"))
+            await sink.write_bytes(body_path, body, compress=True)
         # Fingerprinting
         techs = []
         try:
-            fp = Fingerprinter(fingerprints_path) if fingerprints_path else None
+            fp = fingerprinter or (load_fingerprinter(fingerprints_path) if fingerprints_path else None)
             if fp:
-                techs = fp.detect(headers={k:v for k,v in r.headers.items()}, html=(r.text or ""))
+                with timed("fingerprint", timings):
+                    techs = fp.detect(headers={k:v for k,v in r.headers.items()}, html=text)
         except Exception:
             pass
         return PreflightResult(
             url=target.url, ok=True, status=r.status_code, reason=r.reason_phrase,
             headers={k:v for k,v in r.headers.items()}, title=title, tls_issuer=tls_issuer,
             tls_subject=tls_subject, final_url=final_url, body_path=body_path, headers_path=headers_path,
-            technologies=techs
+            technologies=techs, tls=tls, body_size=len(body), body_truncated=truncated,
+            body_sha256=hashlib.sha256(body).hexdigest()
         )
     except Exception as e:
-        return PreflightResult(url=target.url, ok=False, reason=str(e), status=None, headers={}, title=None, tls_issuer=None, tls_subject=None, final_url=final_url)
+        kind = _classify_error(e)
+        if kind == "tls":
+            # verification failed (self-signed, private CA, wrong name): the certificate is the finding,
+            # so it is read over the unverified handshake the cert cache already does
+            tls = await _failed_tls(e, target, clients, timeout_ms)
+            if tls:
+                tls_subject, tls_issuer = tls.get("subject"), tls.get("issuer")
+        return PreflightResult(url=target.url, ok=False, reason=str(e), status=None, headers={}, title=None, tls_issuer=tls_issuer, tls_subject=tls_subject, final_url=final_url, error_kind=kind, tls=tls)
+
+async def _failed_tls(e: Exception, target: Target, clients: ClientManager, timeout_ms: int) -> Optional[dict]:
+    try:
+        # the request that failed, which is a redirect hop rather than the target when following redirects
+        url = e.request.url if isinstance(e, httpx.RequestError) else httpx.URL(target.url)
+    except Exception:
+        url = httpx.URL(target.url)
+    if url.scheme != "https":
+        return None
+    try:
+        return await clients.certs.get(url.host, url.port or 443, timeout_ms=timeout_ms)
+    except Exception:
+        return None
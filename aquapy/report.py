@@ -1,26 +1,104 @@
 from __future__ import annotations
-from typing import List
+from typing import Dict, List
 from datetime import datetime
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from functools import lru_cache
+from jinja2 import ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 from .models import Entry
 from collections import defaultdict
-import os, json
+import glob, json, os
 
-def render_report(entries: List[Entry], output_dir: str, template_dir: str) -> str:
-    env = Environment(loader=FileSystemLoader(template_dir), autoescape=select_autoescape(['html','xml']))
-    tpl = env.get_template("report.html.j2")
-    def rel(path): return os.path.relpath(path, output_dir)
+BUILTIN_TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+REPORT_MODES = ("auto", "full", "sharded")
+SHARDED_MIN_ENTRIES = 2000  # auto mode switches to the sharded shell from here on
+DATA_DIR = "aquapy_report_data"
+
+@lru_cache(maxsize=None)
+def _env(template_dir: str) -> Environment:
+    # one Environment per template dir (it caches parsed templates); the bytecode cache keeps the compiled
+    # templates on disk, so repeated CLI runs (-session in CI loops) skip Jinja's parse/compile step
+    # a -template-path dir only needs the templates it overrides; the rest (sharded shell, _style, diff) come from the package
+    loaders = [FileSystemLoader(template_dir)]
+    if os.path.abspath(template_dir) != BUILTIN_TEMPLATES:
+        loaders.append(FileSystemLoader(BUILTIN_TEMPLATES))
+    return Environment(loader=ChoiceLoader(loaders), autoescape=select_autoescape(['html','xml']),
+                       bytecode_cache=FileSystemBytecodeCache(), auto_reload=False)
+
+def _group(entries: List[Entry]) -> Dict[int, List[Entry]]:
     grouped = defaultdict(list)
     for e in entries:
         cid = 0
         if e.shot and e.shot.cluster_id:
             cid = e.shot.cluster_id
         grouped[cid].append(e)
-    html = tpl.render(entries=entries, grouped=grouped, clusters=[k for k in grouped.keys()], now=datetime.utcnow().isoformat(timespec="seconds")+"Z", rel=rel)
+    return grouped
+
+def _write_jsonp(path: str, callback: str, *args):
+    # JSONP instead of .json: fetch() is blocked on file:// but <script src> is not
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{callback}(" + ",".join(json.dumps(a, separators=(",", ":")) for a in args) + ");\n")
+
+def _write_shards(grouped: Dict[int, List[Entry]], output_dir: str, shard_size: int) -> dict:
+    # index.js: one compact row per card (enough to filter, sort and draw it);
+    # shard js files: the heavy per-card detail (headers, artifacts, tls), loaded only when a card scrolls into view
+    data_dir = os.path.join(output_dir, DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(data_dir, "*.js")):
+        os.remove(stale)
+    def rel(path): return os.path.relpath(path, output_dir) if path else None
+    techs: Dict[str, int] = {}
+    rows = []; clusters = []
+    for cid, group in grouped.items():
+        shards = []
+        for start in range(0, len(group), shard_size):
+            key = f"c{cid}-{start // shard_size}"
+            detail = []
+            for pos, e in enumerate(group[start:start + shard_size]):
+                p = e.preflight
+                url = p.final_url or p.url
+                rows.append([url, p.title or "", p.status or 0, int(p.ok), cid, rel(e.shot.thumb_path or e.shot.path) if e.shot else None, [techs.setdefault(t["name"], len(techs)) for t in p.technologies], len(shards), pos, rel(e.shot.path) if e.shot and e.shot.thumb_path else None])
+                detail.append({"headers": p.headers, "body": rel(p.body_path), "headers_path": rel(p.headers_path), "technologies": p.technologies, "tls": p.tls, "reason": p.reason, "error": e.shot.error if e.shot else None, "alias_of": e.shot.alias_of if e.shot else None})
+            _write_jsonp(os.path.join(data_dir, f"{key}.js"), "aquapyShard", key, detail)
+            shards.append(key)
+        clusters.append({"id": cid, "n": len(group), "shards": shards})
+    _write_jsonp(os.path.join(data_dir, "index.js"), "aquapyIndex", {"techs": list(techs), "clusters": clusters, "rows": rows})
+    return {"entries": len(rows), "clusters": len(clusters)}
+
+def write_urls(entries: List[Entry], output_dir: str) -> str:
+    path = os.path.join(output_dir, "aquatone_urls.txt")
+    with open(path, "w", encoding="utf-8") as uf:
+        for e in entries:
+            if e.preflight.ok:
+                uf.write(f"{e.preflight.final_url or e.preflight.url}\n")
+    return path
+
+def render_report(entries: List[Entry], output_dir: str, template_dir: str, mode: str = "auto", shard_size: int = 500) -> str:
+    env = _env(template_dir)
+    def rel(path): return os.path.relpath(path, output_dir)
+    grouped = _group(entries)
+    now = datetime.utcnow().isoformat(timespec="seconds")+"Z"
+    if mode == "auto":
+        mode = "sharded" if len(entries) >= SHARDED_MIN_ENTRIES else "full"
+    if mode == "sharded":
+        counts = _write_shards(grouped, output_dir, max(1, shard_size))
+        html = env.get_template("report_sharded.html.j2").render(now=now, data_dir=DATA_DIR, **counts)
+    else:
+        tpl = env.get_template("report.html.j2")
+        html = tpl.render(entries=entries, grouped=grouped, clusters=[k for k in grouped.keys()], now=now, rel=rel)
     out = os.path.join(output_dir, "aquapy_report.html")
     with open(out, "w", encoding="utf-8") as f:
         f.write(html)
-    dump = os.path.join(output_dir, "aquapy_session.json")
-    with open(dump, "w", encoding="utf-8") as f:
-        json.dump([e.__dict__ for e in entries], f, default=lambda o: o.__dict__, indent=2)
+    return out
+
+def render_diff(diff: dict, output_dir: str, template_dir: str) -> str:
+    # -baseline: aquapy_diff.json for scripts, aquapy_diff.html to read
+    with open(os.path.join(output_dir, "aquapy_diff.json"), "w", encoding="utf-8") as f:
+        json.dump(diff, f, indent=2)
+    env = _env(template_dir)
+    def rel(path): return os.path.relpath(path, output_dir) if path else None
+    now = datetime.utcnow().isoformat(timespec="seconds")+"Z"
+    html = env.get_template("diff.html.j2").render(diff=diff, now=now, rel=rel)
+    out = os.path.join(output_dir, "aquapy_diff.html")
+    with open(out, "w", encoding="utf-8") as f:
+        f.write(html)
     return out
@@ -0,0 +1,189 @@
+from __future__ import annotations
+import asyncio, time
+from collections import deque
+from typing import Deque, Dict, Optional
+from .models import PreflightResult, Target
+from .targets import target_hostname
+
+THROTTLE_STATUS = (429, 503)
+# consecutive timeouts from a host that has answered before, taken as a sign of overload
+TIMEOUT_STRIKES = 3
+
+class RateLimiter:
+    # token bucket shared by every probe worker; waiters are served in arrival order
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class _Host:
+    __slots__ = ("queue", "active", "limit", "ready_at", "strikes", "timeouts", "answered")
+
+    def __init__(self, limit: int):
+        self.queue: Deque[Target] = deque()
+        self.active = 0
+        self.limit = limit
+        self.ready_at = 0.0
+        self.strikes = 0
+        self.timeouts = 0
+        self.answered = False
+
+def _retry_after(pre: PreflightResult) -> Optional[float]:
+    v = next((v for k, v in pre.headers.items() if k.lower() == "retry-after"), None)
+    try:
+        return float(v) if v is not None else None
+    except ValueError:
+        return None  # HTTP-date form: fall back to our own backoff
+
+class HostScheduler:
+    """Replaces the plain probe queue: hands targets out round-robin across hosts,
+    at most `per_host` at a time per host, and backs a host off (halving its cap)
+    when it answers 429/503, or when a host that has answered times out several times in a row."""
+
+    def __init__(self, per_host: int = 2, rate: float = 0, max_pending: int = 4096, backoff_base: float = 1.0, backoff_max: float = 60.0, max_requeue: int = 2):
+        self.per_host = per_host if per_host > 0 else 1 << 30
+        self.max_pending = max(1, max_pending)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_requeue = max_requeue
+        self.backoffs = 0
+        self.requeued = 0
+        self._limiter = RateLimiter(rate) if rate > 0 else None
+        self._hosts: Dict[str, _Host] = {}
+        self._ring: Deque[str] = deque()  # hosts with queued targets, in round-robin order
+        self._requeues: Dict[str, int] = {}
+        self._cond = asyncio.Condition()
+        self._pending = 0
+        self._in_flight = 0
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _host(self, key: str) -> _Host:
+        h = self._hosts.get(key)
+        if h is None:
+            h = self._hosts[key] = _Host(self.per_host)
+        return h
+
+    def _enqueue(self, key: str, h: _Host, target: Target, front: bool = False):
+        if not h.queue:
+            self._ring.append(key)
+        if front: h.queue.appendleft(target)
+        else: h.queue.append(target)
+        self._pending += 1
+
+    async def put(self, target: Target):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._pending < self.max_pending)
+            key = target_hostname(target)
+            self._enqueue(key, self._host(key), target)
+            self._cond.notify_all()
+
+    async def close(self):
+        # no more puts; get() returns None once everything queued or in flight has finished
+        async with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _pick(self, now: float) -> Optional[Target]:
+        for _ in range(len(self._ring)):
+            key = self._ring[0]
+            self._ring.rotate(-1)
+            h = self._hosts[key]
+            if h.active < h.limit and h.ready_at <= now:
+                target = h.queue.popleft()
+                if not h.queue:
+                    self._ring.pop()  # rotate() just moved it to the end
+                h.active += 1
+                return target
+        return None
+
+    def _next_wakeup(self, now: float) -> Optional[float]:
+        waits = [self._hosts[k].ready_at - now for k in self._ring if self._hosts[k].ready_at > now]
+        return min(waits) if waits else None
+
+    async def get(self) -> Optional[Target]:
+        async with self._cond:
+            while True:
+                now = time.monotonic()
+                target = self._pick(now)
+                if target is not None:
+                    self._pending -= 1
+                    self._in_flight += 1
+                    self._cond.notify_all()
+                    break
+                if self._closed and self._pending == 0 and self._in_flight == 0:
+                    return None
+                try:
+                    await asyncio.wait_for(self._cond.wait(), self._next_wakeup(now))
+                except asyncio.TimeoutError:
+                    pass
+        if self._limiter is not None:
+            await self._limiter.acquire()
+        return target
+
+    def _back_off(self, h: _Host, delay: float):
+        self.backoffs += 1
+        h.limit = max(1, h.limit // 2)
+        h.ready_at = max(h.ready_at, time.monotonic() + delay)
+
+    async def done(self, target: Target, pre: PreflightResult) -> bool:
+        """Report a finished probe. Returns True when the target was queued again
+        (throttled by the host) and its result should be discarded."""
+        async with self._cond:
+            key = target_hostname(target)
+            h = self._hosts[key]
+            h.active -= 1
+            self._in_flight -= 1
+            requeued = False
+            throttled = pre.status in THROTTLE_STATUS
+            timed_out = not pre.ok and pre.error_kind == "timeout"
+            if throttled:
+                self._back_off(h, min(self.backoff_max, _retry_after(pre) or self.backoff_base * 2 ** h.strikes))
+                h.strikes += 1
+                # a 429/503 is the host asking us to come back later
+                n = self._requeues.get(target.url, 0)
+                if n < self.max_requeue:
+                    self._requeues[target.url] = n + 1
+                    self._enqueue(key, h, target, front=True)
+                    self.requeued += 1
+                    requeued = True
+            elif timed_out:
+                # timeouts already went through retries_http, and on hosts that never answered they are
+                # filtered or non-HTTP ports, not load: only a run of them from a live host slows it down,
+                # by one flat backoff_base per run. Pool timeouts (error_kind "pool") are our own limit
+                h.timeouts += 1
+                if h.answered and h.timeouts >= TIMEOUT_STRIKES:
+                    h.timeouts = 0
+                    self._back_off(h, self.backoff_base)
+            else:
+                h.timeouts = 0
+                h.answered = h.answered or pre.ok or pre.error_kind != "pool"
+                if pre.ok:
+                    h.strikes = 0
+                    h.limit = min(self.per_host, h.limit + 1)
+            if not requeued:
+                self._requeues.pop(target.url, None)
+            if not h.queue and h.active == 0 and h.ready_at <= time.monotonic():
+                del self._hosts[key]
+            self._cond.notify_all()
+            return requeued
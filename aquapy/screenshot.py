@@ -1,9 +1,11 @@
 from __future__ import annotations
 from typing import Optional
-from PIL import Image
-import imagehash, asyncio
+from concurrent.futures import Executor
+import asyncio, time
 from .models import ShotResult
-from playwright.async_api import async_playwright
+from .browser_pool import BrowserPool
+from .imaging import process_screenshot
+from .metrics import record, timed
 
 MOBILE_PROFILES = {
     "mobile": {
@@ -16,48 +18,50 @@ MOBILE_PROFILES = {
     }
 }
 
-async def _take(browser, url: str, out_path: str, viewport: dict, user_agent: str, timeout_ms: int, full_page: bool, proxy: Optional[str]) -> Optional[str]:
-    context_kwargs = {"viewport": viewport, "user_agent": user_agent, "ignore_https_errors": True}
-    if proxy:
-        context_kwargs["proxy"] = {"server": proxy}
-    ctx = await browser.new_context(**context_kwargs)
-    page = await ctx.new_page()
-    await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
-    await page.wait_for_load_state("networkidle", timeout=timeout_ms)
+def _profile(profile: str, width: int, height: int, user_agent: str):
+    prof = MOBILE_PROFILES.get(profile, MOBILE_PROFILES["desktop"])
+    vp = prof["viewport"] if profile in MOBILE_PROFILES else {"width": width, "height": height}
+    ua = prof["user_agent"] if profile in MOBILE_PROFILES else user_agent
+    return vp, ua
+
+async def _take(page, url: str, timeout_ms: int, full_page: bool, timings: Optional[dict] = None) -> bytes:
+    with timed("goto", timings):
+        await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+    with timed("networkidle", timings):
+        await page.wait_for_load_state("networkidle", timeout=timeout_ms)
     await page.evaluate("() => window.scrollTo(0, 0)")
-    await page.screenshot(path=out_path, full_page=full_page)
-    await ctx.close()
-    return out_path
+    with timed("screenshot", timings):
+        return await page.screenshot(full_page=full_page)
 
-async def screenshot_url(url: str, out_path: str, width: int, height: int, user_agent: str, timeout_ms: int = 30000, proxy: Optional[str]=None, chrome_path: Optional[str]=None, full_page: bool=False, profile: str="desktop", retries: int=1) -> ShotResult:
+async def screenshot_page(pool: BrowserPool, url: str, out_path: str, width: int, height: int, user_agent: str, timeout_ms: int = 30000, proxy: Optional[str]=None, full_page: bool=False, profile: str="desktop", retries: int=1, executor: Optional[Executor]=None, fmt: str="png", quality: int=80, thumb_width: int=0) -> ShotResult:
+    vp, ua = _profile(profile, width, height, user_agent)
+    timings: dict = {}
+    t0 = time.perf_counter()
     try:
-        async with async_playwright() as p:
-            launch_kwargs = {"headless": True, "args": ["--no-sandbox"]}
-            if chrome_path:
-                launch_kwargs["executable_path"] = chrome_path
-            browser = await p.chromium.launch(**launch_kwargs)
-            prof = MOBILE_PROFILES.get(profile, MOBILE_PROFILES["desktop"])
-            vp = prof["viewport"] if profile in MOBILE_PROFILES else {"width": width, "height": height}
-            ua = prof["user_agent"] if profile in MOBILE_PROFILES else user_agent
+        last_exc = None
+        for attempt in range(retries+1):
+            try:
+                async with pool.page(vp, ua, proxy=proxy) as page:
+                    png = await _take(page, url, timeout_ms, full_page, timings)
+                # encode, thumbnail, file writes and pHash run off the event loop
+                with timed("image", timings):
+                    img = await asyncio.get_running_loop().run_in_executor(executor, process_screenshot, png, out_path, fmt, quality, thumb_width)
+                record("shot", time.perf_counter() - t0, timings)
+                return ShotResult(url=url, path=img["path"], width=vp["width"], height=vp["height"], phash=img["phash"], error=None, thumb_path=img["thumb_path"], timings=timings)
+            except Exception as e:
+                last_exc = e
+                if attempt < retries:
+                    await asyncio.sleep(0.25 * (attempt+1))
+                else:
+                    raise last_exc
+    except Exception as e:
+        record("shot", time.perf_counter() - t0, timings)
+        return ShotResult(url=url, path=None, width=width, height=height, phash=None, error=str(e), timings=timings)
 
-            last_exc = None
-            for attempt in range(retries+1):
-                try:
-                    path = await _take(browser, url, out_path, vp, ua, timeout_ms, full_page, proxy)
-                    ph = None
-                    try:
-                        img = Image.open(out_path)
-                        ph = str(imagehash.phash(img))
-                    except Exception:
-                        pass
-                    await browser.close()
-                    return ShotResult(url=url, path=path, width=vp["width"], height=vp["height"], phash=ph, error=None)
-                except Exception as e:
-                    last_exc = e
-                    if attempt < retries:
-                        await asyncio.sleep(0.25 * (attempt+1))
-                    else:
-                        await browser.close()
-                        raise last_exc
+async def screenshot_url(url: str, out_path: str, width: int, height: int, user_agent: str, timeout_ms: int = 30000, proxy: Optional[str]=None, chrome_path: Optional[str]=None, full_page: bool=False, profile: str="desktop", retries: int=1) -> ShotResult:
+    # one-off capture; long runs should share a BrowserPool via screenshot_page
+    try:
+        async with BrowserPool(browsers=1, pages_per_browser=1, chrome_path=chrome_path) as pool:
+            return await screenshot_page(pool, url, out_path, width, height, user_agent, timeout_ms=timeout_ms, proxy=proxy, full_page=full_page, profile=profile, retries=retries)
     except Exception as e:
         return ShotResult(url=url, path=None, width=width, height=height, phash=None, error=str(e))
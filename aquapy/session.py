@@ -0,0 +1,148 @@
+from __future__ import annotations
+import json, os, queue, threading
+from typing import IO, Iterator, Optional
+from .models import Entry, PreflightResult, ShotResult
+from .targets import SeenSet
+
+SESSION_FILE = "aquatone_session.jsonl"
+LEGACY_SESSION_FILE = "aquatone_session.json"
+
+def find_session(src: str) -> str:
+    # a session file, or an output dir holding one
+    if os.path.isfile(src):
+        return src
+    for name in (SESSION_FILE, LEGACY_SESSION_FILE):
+        p = os.path.join(src, name)
+        if os.path.exists(p):
+            return p
+    raise SystemExit(f"No session store in {src}")
+
+def entry_to_dict(e: Entry) -> dict:
+    return {"preflight": dict(e.preflight.__dict__), "shot": dict(e.shot.__dict__) if e.shot else None}
+
+def entry_from_dict(item: dict) -> Entry:
+    pre = item.get("preflight") if "preflight" in item else item
+    shot = item.get("shot")
+    return Entry(preflight=PreflightResult(**pre), shot=ShotResult(**shot) if shot else None)
+
+def iter_session(path: str) -> Iterator[Entry]:
+    # JSON Lines store, one Entry per line; legacy aquatone_session.json arrays are still accepted
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if head == "[":
+            f.seek(0)
+            for item in json.load(f):
+                yield entry_from_dict(item)
+            return
+        f.seek(0)
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                # torn last line from a crash mid-write
+                continue
+            yield entry_from_dict(item)
+
+class SessionStore:
+    # append-only: each Entry is on disk as soon as it completes, so a crash loses at most the unsynced tail.
+    # Callers on the event loop only serialize and enqueue; one writer thread does the write/flush/fsync.
+    def __init__(self, out_dir: str, fsync_every: int = 256, filename: str = SESSION_FILE):
+        self.path = os.path.join(out_dir, filename)
+        self.fsync_every = fsync_every
+        self.count = 0
+        self._f: Optional[IO[str]] = None
+        self._unsynced = 0
+        self._q: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def seen(self) -> SeenSet:
+        # target URLs already recorded, for -resume
+        seen = SeenSet()
+        if self.exists():
+            for e in iter_session(self.path):
+                seen.add(e.preflight.url)
+        return seen
+
+    def open(self, resume: bool = False):
+        if resume and self.exists():
+            self._repair_tail()
+        self._f = open(self.path, "a" if resume else "w", encoding="utf-8")
+        self._writer = threading.Thread(target=self._write_loop, name="aquapy-session", daemon=True)
+        self._writer.start()
+        return self
+
+    def _repair_tail(self):
+        # drop a torn last line so appended entries start on a fresh line
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END); size = f.tell()
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+            if tail.endswith(b"\n"):
+                return
+            cut = tail.rfind(b"\n")
+            f.truncate(size - len(tail) + cut + 1 if cut >= 0 else (0 if size <= 65536 else size))
+
+    def append(self, e: Entry):
+        if self._error is not None:
+            raise self._error
+        self._q.put(json.dumps(entry_to_dict(e), separators=(",", ":"), default=lambda o: o.__dict__) + "\n")
+        self.count += 1
+
+    def _write_loop(self):
+        while True:
+            line = self._q.get()
+            if line is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._f.write(line)
+                # a burst is written before the flush, so a fast producer costs one syscall per batch
+                while True:
+                    try: nxt = self._q.get_nowait()
+                    except queue.Empty: break
+                    if nxt is None:
+                        self._q.put(None)
+                        break
+                    self._f.write(nxt)
+                    self._unsynced += 1
+                self._f.flush()
+                self._unsynced += 1
+                if self.fsync_every > 0 and self._unsynced >= self.fsync_every:
+                    os.fsync(self._f.fileno())
+                    self._unsynced = 0
+            except BaseException as exc:
+                self._error = exc
+
+    def __iter__(self) -> Iterator[Entry]:
+        return iter_session(self.path)
+
+    def close(self):
+        if self._writer is not None:
+            self._q.put(None)
+            self._writer.join()
+            self._writer = None
+        if self._f is not None:
+            self._f.flush()
+            if self.fsync_every > 0 and self._unsynced:
+                os.fsync(self._f.fileno())
+            self._f.close()
+            self._f = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+import glob, hashlib, itertools, os, sys
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlsplit
+from .models import Target
+from .utils import extract_targets_from_text
+from .nmap_masscan import iter_open_ports, iter_open_ports_lines, sniff
+
+def _url_from_host_port(host: str, port: int) -> str:
+    scheme = "https" if port in (443, 8443, 9443, 12443) else "http"
+    default_port = (scheme == "https" and port == 443) or (scheme == "http" and port == 80)
+    return f"{scheme}://{host}" if default_port else f"{scheme}://{host}:{port}"
+
+def expand_targets_line(line: str, ports: list[int]) -> List[Target]:
+    line = line.strip()
+    if not line: return []
+    if line.startswith("http://") or line.startswith("https://"):
+        return [Target(host=line.split("://",1)[1].split("/",1)[0], url=line)]
+    return [Target(host=line, url=_url_from_host_port(line, p)) for p in ports]
+
+def target_port(target: Target) -> int:
+    u = urlsplit(target.url)
+    try:
+        if u.port: return u.port
+    except ValueError:
+        pass
+    return 443 if u.scheme == "https" else 80
+
+def target_hostname(target: Target) -> str:
+    return urlsplit(target.url).hostname or target.host
+
+class SeenSet:
+    # 64-bit digests instead of full URLs: a few bytes per target on multi-million line inputs
+    def __init__(self):
+        self._seen: set = set()
+
+    @staticmethod
+    def _key(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8", "surrogateescape"), digest_size=8).digest(), "big")
+
+    def add(self, value: str) -> bool:
+        k = self._key(value)
+        if k in self._seen:
+            return False
+        self._seen.add(k)
+        return True
+
+    def __contains__(self, value: str) -> bool:
+        return self._key(value) in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+def parse_shard(arg: str) -> Tuple[int, int]:
+    # "i/N", 0 <= i < N
+    try:
+        i, n = (int(x) for x in arg.split("/", 1))
+    except ValueError:
+        raise SystemExit(f"Invalid -shard value: {arg} (expected i/N)")
+    if n < 1 or not 0 <= i < n:
+        raise SystemExit(f"Invalid -shard value: {arg} (need 0 <= i < N)")
+    return i, n
+
+def shard_of(target: Target, n: int, by: str = "host") -> int:
+    # stable across processes and machines (unlike hash()); by host keeps every port of a host on one node
+    key = target_hostname(target) if by == "host" else target.url
+    return SeenSet._key(key.lower() if by == "host" else key) % n
+
+def expand_paths(patterns: Union[str, Sequence[str], None]) -> List[str]:
+    # -i takes several files; quoted globs are expanded here (sorted, so shards see the same order)
+    if not patterns:
+        return []
+    out = []
+    for pattern in [patterns] if isinstance(patterns, str) else patterns:
+        pattern = os.path.expanduser(pattern)
+        if any(c in pattern for c in "*?["):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                print(f"no files match {pattern}", file=sys.stderr)
+            out.extend(matches)
+        else:
+            out.append(pattern)
+    return out
+
+def iter_lines(paths: Union[str, Sequence[str], None]) -> Iterator[str]:
+    if paths:
+        for path in expand_paths(paths):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    yield line.rstrip("\r\n")
+    else:
+        for line in sys.stdin:
+            yield line.rstrip("\r\n")
+
+def _iter_scan_ports(input_paths: Union[str, Sequence[str], None], lines: Iterator[str]) -> Iterator[Tuple[str, int]]:
+    # -nmap: scanner output files from -i, or on stdin either the output itself or one file path/glob per line
+    if input_paths:
+        for path in expand_paths(input_paths):
+            yield from iter_open_ports(path)
+        return
+    for first in lines:
+        if first.strip():
+            break
+    else:
+        return
+    if sniff(first):
+        yield from iter_open_ports_lines(itertools.chain([first], lines))
+        return
+    for ln in itertools.chain([first], lines):
+        if ln.strip():
+            for path in expand_paths(ln.strip()):
+                yield from iter_open_ports(path)
+
+def iter_targets(lines: Iterable[str], ports: List[int], nmap: bool = False, input_path: Union[str, Sequence[str], None] = None, seen: Optional[SeenSet] = None, shard: Optional[Tuple[int, int]] = None, shard_by: str = "host") -> Iterator[Target]:
+    seen = seen if seen is not None else SeenSet()
+    lines = iter(lines)
+    def fresh(targets):
+        for t in targets:
+            if shard is not None and shard_of(t, shard[1], shard_by) != shard[0]:
+                continue
+            if seen.add(t.url):
+                yield t
+    if nmap:
+        # pairs stream straight from the parser; repeats (masscan writes one <host> per port) fall to `seen`
+        for host, port in _iter_scan_ports(input_path, lines):
+            yield from fresh(expand_targets_line(host, [port]))
+        return
+    for line in lines:
+        extracted = extract_targets_from_text(line)
+        if not extracted and line.strip():
+            extracted = [line]
+        for item in extracted:
+            yield from fresh(expand_targets_line(item, ports))
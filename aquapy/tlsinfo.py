@@ -0,0 +1,178 @@
+from __future__ import annotations
+import asyncio, hashlib, ssl
+from typing import Dict, List, Optional, Tuple
+
+def _insecure_context() -> ssl.SSLContext:
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+# getpeercert() only returns the parsed dict for verified peers; for the rest (self-signed, private CAs,
+# the insecure fallback handshake) the DER is read here into the same shape, with no extra dependency
+_OID_NAMES = {
+    "2.5.4.3": "commonName", "2.5.4.4": "surname", "2.5.4.5": "serialNumber", "2.5.4.6": "countryName",
+    "2.5.4.7": "localityName", "2.5.4.8": "stateOrProvinceName", "2.5.4.9": "streetAddress",
+    "2.5.4.10": "organizationName", "2.5.4.11": "organizationalUnitName", "2.5.4.17": "postalCode",
+    "2.5.4.97": "organizationIdentifier",
+    "1.2.840.113549.1.9.1": "emailAddress", "0.9.2342.19200300.100.1.25": "domainComponent",
+}
+_SAN_OID = "2.5.29.17"
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+def _tlv(buf: bytes, i: int) -> Tuple[int, bytes, int]:
+    # one DER element at i: (tag, content, offset after it)
+    tag, n = buf[i], buf[i+1]
+    i += 2
+    if n & 0x80:
+        k = n & 0x7f
+        n = int.from_bytes(buf[i:i+k], "big")
+        i += k
+    if i + n > len(buf):
+        raise ValueError("truncated DER")
+    return tag, buf[i:i+n], i + n
+
+def _children(buf: bytes) -> List[Tuple[int, bytes]]:
+    out, i = [], 0
+    while i < len(buf):
+        tag, val, i = _tlv(buf, i)
+        out.append((tag, val))
+    return out
+
+def _oid(b: bytes) -> str:
+    parts, v = [], 0
+    for c in b:
+        v = (v << 7) | (c & 0x7f)
+        if not c & 0x80:
+            parts.append(v)
+            v = 0
+    first = min(parts[0] // 40, 2)
+    return ".".join(map(str, [first, parts[0] - 40*first, *parts[1:]]))
+
+def _der_name(b: bytes) -> tuple:
+    rdns = []
+    for _, rdn in _children(b):
+        attrs = []
+        for _, atv in _children(rdn):
+            (_, oid), (tag, val) = _children(atv)[:2]
+            # BMPString is UTF-16; the other string types are ASCII subsets or UTF-8
+            text = val.decode("utf-16-be" if tag == 0x1e else "utf-8", errors="replace")
+            attrs.append((_OID_NAMES.get(_oid(oid), _oid(oid)), text))
+        rdns.append(tuple(attrs))
+    return tuple(rdns)
+
+def _der_time(tag: int, b: bytes) -> str:
+    s = b.decode("ascii")
+    if tag == 0x17:  # UTCTime: two-digit year, 50-99 is 19xx
+        s = ("19" if int(s[:2]) >= 50 else "20") + s
+    y, mo, d, hh, mm, ss = s[:4], int(s[4:6]), int(s[6:8]), s[8:10], s[10:12], s[12:14] or "00"
+    return f"{_MONTHS[mo-1]} {d:>2} {hh}:{mm}:{ss} {y} GMT"
+
+def _der_sans(b: bytes) -> tuple:
+    out = []
+    for tag, val in _children(b):
+        if tag == 0x81:
+            out.append(("email", val.decode("ascii", errors="replace")))
+        elif tag == 0x82:
+            out.append(("DNS", val.decode("ascii", errors="replace")))
+        elif tag == 0x87 and len(val) == 4:
+            out.append(("IP Address", ".".join(map(str, val))))
+        elif tag == 0x87 and len(val) == 16:
+            # OpenSSL spells IPv6 uncompressed, e.g. 0:0:0:0:0:0:0:1; kept so both paths agree
+            out.append(("IP Address", ":".join(f"{int.from_bytes(val[i:i+2], 'big'):X}" for i in range(0, 16, 2))))
+    return tuple(out)
+
+def _decode_der(der: bytes) -> dict:
+    try:
+        _, cert, _ = _tlv(der, 0)
+        _, tbs, _ = _tlv(cert, 0)
+        fields = _children(tbs)
+        if fields and fields[0][0] == 0xa0:  # explicit [0] version
+            fields = fields[1:]
+        (_, serial), _alg, (_, issuer), (_, validity), (_, subject) = fields[:5]
+        (nb_tag, nb), (na_tag, na) = _children(validity)[:2]
+        out = {"subject": _der_name(subject), "issuer": _der_name(issuer),
+               "serialNumber": serial.lstrip(b"\x00").hex().upper() or "00",
+               "notBefore": _der_time(nb_tag, nb), "notAfter": _der_time(na_tag, na)}
+        for tag, val in fields[5:]:
+            if tag != 0xa3:  # explicit [3] extensions
+                continue
+            for _, ext in _children(_children(val)[0][1]):
+                parts = _children(ext)
+                if _oid(parts[0][1]) == _SAN_OID:
+                    out["subjectAltName"] = _der_sans(_children(parts[-1][1])[0][1])
+        return out
+    except Exception:
+        return {}
+
+def _name(rdns) -> Optional[str]:
+    if not rdns:
+        return None
+    return ", ".join(f"{k}={v}" for rdn in rdns for k, v in rdn)
+
+def cert_details(der: bytes, decoded: Optional[dict] = None) -> dict:
+    cert = decoded or _decode_der(der)
+    return {
+        "subject": _name(cert.get("subject")),
+        "issuer": _name(cert.get("issuer")),
+        "sans": [v for k, v in cert.get("subjectAltName", ()) if k in ("DNS", "IP Address")],
+        "not_before": cert.get("notBefore"),
+        "not_after": cert.get("notAfter"),
+        "serial": cert.get("serialNumber"),
+        "sha256": hashlib.sha256(der).hexdigest(),
+    }
+
+def cert_from_ssl_object(obj) -> Optional[dict]:
+    if obj is None:
+        return None
+    der = obj.getpeercert(binary_form=True)
+    if not der:
+        return None
+    return cert_details(der, obj.getpeercert() or None)
+
+def cert_from_response(r) -> Optional[dict]:
+    try:
+        stream = r.extensions.get("network_stream")
+        return cert_from_ssl_object(stream.get_extra_info("ssl_object")) if stream is not None else None
+    except Exception:
+        return None
+
+class CertCache:
+    def __init__(self, dns=None):
+        self.dns = dns
+        self._ctx = _insecure_context()
+        self._certs: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    def put(self, host: str, port: int, cert: Optional[dict]):
+        key = (host.lower(), port)
+        fut = self._certs.get(key)
+        if fut is None or (fut.done() and fut.result() is None):
+            fut = asyncio.get_running_loop().create_future()
+            fut.set_result(cert)
+            self._certs[key] = fut
+
+    async def get(self, host: str, port: int, timeout_ms: int = 3000) -> Optional[dict]:
+        key = (host.lower(), port)
+        fut = self._certs.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._fetch(host, port, timeout_ms))
+            self._certs[key] = fut
+        return await asyncio.shield(fut)
+
+    async def _fetch(self, host: str, port: int, timeout_ms: int) -> Optional[dict]:
+        addrs = [host]
+        if self.dns is not None:
+            addrs = await self.dns.resolve(host)
+        for addr in addrs:
+            writer = None
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(addr, port, ssl=self._ctx, server_hostname=host), timeout_ms/1000)
+                return cert_from_ssl_object(writer.get_extra_info("ssl_object"))
+            except Exception:
+                continue
+            finally:
+                if writer is not None:
+                    writer.close()
+                    try: await writer.wait_closed()
+                    except Exception: pass
+        return None
@@ -0,0 +1,82 @@
+"""pHash clustering benchmark: multi-index hashing / NumPy engines vs the original all-pairs union-find.
+
+    python benchmarks/bench_cluster.py [-sizes 1000,10000,100000] [-threshold 10]
+"""
+from __future__ import annotations
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from aquapy.cluster import _numpy, cluster_phashes, hamming
+
+np = _numpy()
+
+def legacy_cluster(items, threshold=10):
+    # the original O(n^2) implementation, kept verbatim for comparison
+    parent = {i:i for i,_ in items}
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    def union(a,b):
+        ra, rb = find(a), find(b)
+        if ra != rb: parent[rb] = ra
+    for i in range(len(items)):
+        for j in range(i+1, len(items)):
+            ei, hi = items[i]; ej, hj = items[j]
+            if hi and hj and hamming(hi, hj) <= threshold:
+                union(ei, ej)
+    roots = {}; next_id = 1; out = {}
+    for idx,_ in items:
+        r = find(idx)
+        if r not in roots:
+            roots[r] = next_id; next_id += 1
+        out[idx] = roots[r]
+    return out
+
+def make_items(n: int, rng: random.Random, centers: int, dup_ratio: float):
+    # screenshots of real scopes: a few page families (default vhosts, login pages...) plus noise
+    base = [rng.getrandbits(64) for _ in range(max(1, centers))]
+    items = []
+    for idx in range(n):
+        r = rng.random()
+        if r < dup_ratio:
+            v = rng.choice(base)
+        elif r < 0.85:
+            v = rng.choice(base)
+            for _ in range(rng.randint(1, 14)):
+                v ^= 1 << rng.randrange(64)
+        else:
+            v = rng.getrandbits(64)
+        items.append((idx, f"{v:016x}"))
+    return items
+
+def timed(fn):
+    t0 = time.perf_counter(); out = fn(); return out, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-sizes", default="1000,10000,100000")
+    ap.add_argument("-threshold", type=int, default=10)
+    ap.add_argument("-centers", type=int, default=500, help="distinct page families")
+    ap.add_argument("-dup-ratio", dest="dup_ratio", type=float, default=0.4, help="share of byte-identical hashes")
+    ap.add_argument("-legacy-max", dest="legacy_max", type=int, default=3000, help="skip the O(n^2) baseline above this size")
+    ap.add_argument("-seed", type=int, default=1)
+    args = ap.parse_args()
+    methods = ["mih"] + (["numpy"] if np is not None else [])
+    print(f"threshold={args.threshold} centers={args.centers} dup_ratio={args.dup_ratio} numpy={'yes' if np is not None else 'no'}")
+    print(f"{'n':>8} " + " ".join(f"{m:>10}" for m in ["legacy"] + methods) + "   clusters")
+    for n in (int(x) for x in args.sizes.split(",") if x.strip()):
+        items = make_items(n, random.Random(args.seed), args.centers, args.dup_ratio)
+        row = []; results = []
+        if n <= args.legacy_max:
+            out, dt = timed(lambda: legacy_cluster(items, args.threshold)); results.append(out); row.append(f"{dt:9.2f}s")
+        else:
+            row.append(f"{'-':>10}")
+        for m in methods:
+            out, dt = timed(lambda: cluster_phashes(items, threshold=args.threshold, method=m)); results.append(out); row.append(f"{dt:9.2f}s")
+        assert all(r == results[0] for r in results), f"engines disagree at n={n}"
+        print(f"{n:>8} " + " ".join(row) + f"   {len(set(results[0].values()))}")
+
+if __name__ == "__main__":
+    main()
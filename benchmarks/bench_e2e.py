@@ -0,0 +1,53 @@
+"""End-to-end benchmark: the full `python -m aquapy` CLI against the local stand-in fleet from aquapy.bench.
+
+    python benchmarks/bench_e2e.py [-targets 2000] [-ports 64] [-- -workers 4 -no-scan ...]
+
+Everything after `--` is passed to the CLI; run it once per configuration and compare targets/sec.
+"""
+from __future__ import annotations
+import argparse, asyncio, os, resource, subprocess, sys, tempfile, threading, time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from aquapy.bench import Fleet
+
+def start_fleet(ports: int, closed: int):
+    # the fleet gets its own loop in a thread; the CLI runs as a child process
+    ready = threading.Event(); box = {}
+    def run():
+        loop = asyncio.new_event_loop(); asyncio.set_event_loop(loop)
+        box["fleet"] = loop.run_until_complete(Fleet(ports=ports, closed=closed).start())
+        ready.set()
+        loop.run_forever()
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return box["fleet"]
+
+def main():
+    argv = sys.argv[1:]
+    extra = argv[argv.index("--") + 1:] if "--" in argv else []
+    argv = argv[:argv.index("--")] if "--" in argv else argv
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-targets", type=int, default=2000)
+    ap.add_argument("-ports", type=int, default=64)
+    ap.add_argument("-closed", type=int, default=8)
+    args = ap.parse_args(argv)
+    fleet = start_fleet(args.ports, args.closed)
+    with tempfile.TemporaryDirectory(prefix="aquapy-e2e-") as tmp:
+        targets = os.path.join(tmp, "targets.txt")
+        with open(targets, "w") as f:
+            f.writelines(t.url + "\n" for t in fleet.targets(args.targets))
+        # the whole fleet is one IP: without -per-host 0 the politeness cap would serialize it
+        polite = [] if "-per-host" in extra else ["-per-host", "0"]
+        cmd = [sys.executable, "-m", "aquapy", "-i", targets, "-out", os.path.join(tmp, "out"), "-silent", *polite, *extra]
+        print(" ".join(cmd[1:]), file=sys.stderr)
+        t0 = time.perf_counter()
+        rc = subprocess.run(cmd, cwd=ROOT).returncode
+        dt = time.perf_counter() - t0
+        with open(os.path.join(tmp, "out", "aquatone_session.jsonl")) as f:
+            entries = sum(1 for _ in f)
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    print(f"rc={rc} targets={args.targets} entries={entries} wall={dt:.2f}s rate={args.targets / dt:.1f}/s child_peak_rss={rss:.0f}MB")
+
+if __name__ == "__main__":
+    main()
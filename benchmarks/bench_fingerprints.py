@@ -0,0 +1,104 @@
+"""Fingerprinter micro-benchmark: compiled/indexed engine vs the original per-target linear scan.
+
+    python benchmarks/bench_fingerprints.py [-techs 3000] [-body-kb 100] [-iterations 50]
+"""
+from __future__ import annotations
+import argparse, json, os, random, string, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from aquapy.fingerprints import Fingerprinter
+
+class LegacyFingerprinter:
+    # the pre-index implementation, kept verbatim for comparison
+    def __init__(self, fingerprints_path: str):
+        self.db = {"technologies": []}
+        try:
+            with open(fingerprints_path, "r", encoding="utf-8") as f:
+                self.db = json.load(f)
+        except Exception:
+            pass
+
+    def detect(self, headers, html):
+        techs = []
+        hdrs = { (k or '').lower(): (v or '').lower() for k,v in (headers or {}).items() }
+        body = (html or "").lower()
+        for t in self.db.get("technologies", []):
+            score = 0; matched = False
+            for hk, hv in (t.get("headers") or {}).items():
+                hv = hv.lower()
+                if hk.lower() in hdrs and hv in hdrs[hk.lower()]:
+                    score += 2; matched = True
+            for frag in (t.get("html") or []):
+                if frag.lower() in body:
+                    score += 1; matched = True
+            if matched:
+                techs.append({"name": t.get("name"), "slug": t.get("slug"), "categories": t.get("categories", []), "score": score})
+        techs.sort(key=lambda x: (-x["score"], x["name"] or ""))
+        return techs
+
+def _word(rng: random.Random, n: int) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(n))
+
+def make_db(n: int, rng: random.Random) -> dict:
+    hdr_names = ["server", "x-powered-by", "x-generator", "via", "x-aspnet-version", "x-drupal-cache"]
+    techs = []
+    for i in range(n):
+        name = f"Tech{i}"
+        techs.append({
+            "name": name, "slug": name.lower(), "categories": ["Synthetic"],
+            "headers": {rng.choice(hdr_names): f"{_word(rng, 6)}{i}"},
+            "html": [f"{_word(rng, 5)}-{i}-{_word(rng, 4)}", f"data-{_word(rng, 8)}"],
+        })
+    # legacy plain-text fragments the indexed engine can't take as regexes or as shared-matcher literals
+    for i, frag in enumerate((f"[if ie {_word(rng, 6)}", f"({_word(rng, 8)}", f"<div>{_word(rng, 240)}</div>")):
+        techs.append({"name": f"Edge{i}", "slug": f"edge{i}", "categories": ["Synthetic"], "html": [frag]})
+    return {"technologies": techs}
+
+def make_body(kb: int, db: dict, rng: random.Random, hits: int) -> str:
+    parts = []; size = 0
+    planted = rng.sample(db["technologies"], hits) + [t for t in db["technologies"] if t["name"].startswith("Edge")]
+    frags = [f for t in planted for f in t["html"]]
+    while size < kb * 1024:
+        chunk = f'<div class="{_word(rng, 7)}" id="{_word(rng, 5)}">{_word(rng, 40)} {_word(rng, 12)}</div>\n'
+        if frags and rng.random() < 0.01:
+            chunk += frags.pop() + "\n"
+        parts.append(chunk); size += len(chunk)
+    parts.extend(frags)
+    return "<html><head><title>bench</title></head><body>" + "".join(parts) + "</body></html>"
+
+def bench(label: str, fn, iterations: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        out = fn()
+    dt = (time.perf_counter() - t0) / iterations
+    print(f"  {label:<34} {dt*1000:9.2f} ms/target   ({len(out)} techs)")
+    return dt
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-techs", type=int, default=3000)
+    ap.add_argument("-body-kb", dest="body_kb", type=int, default=100)
+    ap.add_argument("-hits", type=int, default=10, help="technologies planted in the body")
+    ap.add_argument("-iterations", type=int, default=50)
+    ap.add_argument("-seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    db = make_db(args.techs, rng)
+    body = make_body(args.body_kb, db, rng, args.hits)
+    headers = {"Server": db["technologies"][0]["headers"].get("server", "nginx"), "Content-Type": "text/html"}
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(db, f); path = f.name
+    try:
+        t0 = time.perf_counter(); fp = Fingerprinter(path); t_compile = time.perf_counter() - t0
+        legacy = LegacyFingerprinter(path)
+        assert {t["name"] for t in fp.detect(headers, body)} == {t["name"] for t in legacy.detect(headers, body)}, "engines disagree"
+        print(f"{args.techs} techs, {len(body)//1024} KB body, {args.iterations} iterations (compile once: {t_compile*1000:.1f} ms)")
+        a = bench("legacy (load + detect per target)", lambda: LegacyFingerprinter(path).detect(headers, body), args.iterations)
+        b = bench("legacy (detect only)", lambda: legacy.detect(headers, body), args.iterations)
+        c = bench("indexed (detect)", lambda: fp.detect(headers, body), args.iterations)
+        print(f"  speedup vs per-target load: {a/c:.1f}x, vs detect only: {b/c:.1f}x")
+    finally:
+        os.unlink(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Cold-start benchmark: wall time of fresh `python -m aquapy` processes for the light paths, and which heavy modules they load.
+
+    python benchmarks/bench_import.py [-runs 15] [-entries 500] [-budget-ms 0]
+
+-version and -session should never import the scan stack (httpx, Playwright, Pillow, imagehash, numpy);
+a non-zero -budget-ms makes the script exit 1 when a path's median exceeds it or when a heavy module shows up.
+"""
+from __future__ import annotations
+import argparse, os, statistics, subprocess, sys, tempfile, time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from aquapy.models import Entry, PreflightResult, ShotResult
+from aquapy.session import SessionStore
+
+HEAVY = ("httpx", "httpcore", "playwright", "PIL", "imagehash", "numpy")
+
+# runs main() like `python -m aquapy`, then reports which heavy top-level packages ended up imported
+PROBE = """import sys
+sys.argv = ["aquapy", *sys.argv[1:]]
+from aquapy.__main__ import main
+main()
+print("heavy:" + ",".join(sorted({m.split(".")[0] for m in sys.modules} & set(%r))), file=sys.stderr)
+""" % (HEAVY,)
+
+def write_session(out_dir: str, n: int) -> str:
+    with SessionStore(out_dir, fsync_every=0).open() as store:
+        for i in range(n):
+            url = f"http://host{i % 97}.bench:{(80, 443, 8080)[i % 3]}/p{i}"
+            pre = PreflightResult(url=url, ok=True, status=200, reason="OK", headers={"server": "nginx", "content-type": "text/html"}, title=f"page {i}", final_url=url,
+                                  technologies=[{"name": "Nginx", "slug": "nginx", "categories": ["Web Server"], "score": 2}])
+            shot = ShotResult(url=url, path=os.path.join(out_dir, "screenshots", f"{i}.png"), width=1440, height=900, phash=f"{(i % 40) * 0x0101010101010101:016x}")
+            store.append(Entry(preflight=pre, shot=shot))
+    return store.path
+
+def time_cmd(argv, runs: int) -> list:
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "aquapy", *argv], cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+def heavy_modules(argv) -> str:
+    p = subprocess.run([sys.executable, "-c", PROBE, *argv], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    line = [ln for ln in p.stderr.splitlines() if ln.startswith("heavy:")]
+    return line[-1][len("heavy:"):] if line else "?"
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-runs", type=int, default=15)
+    ap.add_argument("-entries", type=int, default=500, help="Entries in the synthetic session for the -session path (default 500)")
+    ap.add_argument("-budget-ms", dest="budget_ms", type=float, default=0, help="Fail when a median exceeds this many ms, 0 = report only (default 0)")
+    args = ap.parse_args()
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="aquapy-import-") as tmp:
+        session = write_session(tmp, args.entries)
+        paths = {
+            "python -c pass": None,
+            "-version": ["-version"],
+            f"-session ({args.entries})": ["-session", session, "-out", os.path.join(tmp, "report")],
+        }
+        print(f"{'path':<22}{'median_ms':>10}{'min_ms':>10}{'max_ms':>10}  heavy imports")
+        for name, argv in paths.items():
+            if argv is None:
+                times = []
+                for _ in range(args.runs):
+                    t0 = time.perf_counter()
+                    subprocess.run([sys.executable, "-c", "pass"], check=True)
+                    times.append((time.perf_counter() - t0) * 1000)
+                heavy = ""
+            else:
+                time_cmd(argv, 1)  # warm the OS page cache and Jinja's bytecode cache
+                times = time_cmd(argv, args.runs)
+                heavy = heavy_modules(argv) or "none"
+            med = statistics.median(times)
+            print(f"{name:<22}{med:>10.1f}{min(times):>10.1f}{max(times):>10.1f}  {heavy}")
+            if args.budget_ms and argv is not None and (med > args.budget_ms or heavy != "none"):
+                failed = True
+    if failed:
+        print(f"over budget ({args.budget_ms:g} ms) or heavy modules imported", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()